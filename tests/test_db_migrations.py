@@ -0,0 +1,154 @@
+"""
+Schema migration tests for the SQLite backend.
+
+Copyright (C) 2025 Metroseksuaali
+Licensed under GNU AGPL v3.0 - see LICENSE file for details.
+"""
+
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from ts_activity_bot.db import SCHEMA_VERSION, Database
+
+# client_snapshots as created by v2-v5 (AUTOINCREMENT, foreign keys not enforced)
+V5_SCHEMA_SQL = """
+CREATE TABLE snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp INTEGER NOT NULL,
+    total_clients INTEGER NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE client_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    snapshot_id INTEGER NOT NULL,
+    client_uid TEXT NOT NULL,
+    client_database_id INTEGER,
+    nickname TEXT NOT NULL,
+    channel_id INTEGER NOT NULL,
+    idle_ms INTEGER,
+    is_away INTEGER DEFAULT 0,
+    away_message TEXT,
+    is_talking INTEGER DEFAULT 0,
+    input_muted INTEGER DEFAULT 0,
+    output_muted INTEGER DEFAULT 0,
+    is_recording INTEGER DEFAULT 0,
+    server_groups TEXT,
+    connected_time INTEGER,
+    FOREIGN KEY (snapshot_id) REFERENCES snapshots(id) ON DELETE CASCADE
+);
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _seed_with_orphans(path: Path, version: int) -> None:
+    """
+    Create a pre-v6 database whose client_snapshots contain orphaned rows.
+
+    Snapshots 1 and 2 exist with 5 client rows between them; snapshots 3
+    and 4 were deleted by an old cleanup that did not cascade, leaving 5
+    client rows (2 of them for a uid seen nowhere else) behind.
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(V5_SCHEMA_SQL)
+    conn.execute("INSERT INTO snapshots (id, timestamp, total_clients) VALUES (1, 1000, 3), (2, 1060, 2)")
+    rows = [
+        (1, 'uid-a'), (1, 'uid-b'), (1, 'uid-c'),
+        (2, 'uid-a'), (2, 'uid-b'),
+        (3, 'uid-a'), (3, 'uid-gone'), (3, 'uid-b'),
+        (4, 'uid-a'), (4, 'uid-gone'),
+    ]
+    conn.executemany(
+        "INSERT INTO client_snapshots (snapshot_id, client_uid, nickname, channel_id) VALUES (?, ?, ?, 1)",
+        [(snapshot_id, uid, uid) for snapshot_id, uid in rows]
+    )
+    if version >= 5:
+        # As backfilled by the v4 -> v5 migration, orphans included
+        conn.executescript("""
+            CREATE TABLE stats_cache (key TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0);
+            INSERT INTO stats_cache VALUES ('snapshot_count', 2), ('client_snapshot_count', 10);
+            CREATE TABLE known_clients (client_uid TEXT PRIMARY KEY) WITHOUT ROWID;
+            INSERT INTO known_clients VALUES ('uid-a'), ('uid-b'), ('uid-c'), ('uid-gone');
+        """)
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+    conn.close()
+
+
+class OrphanedRowMigrationTest(unittest.TestCase):
+    """Upgrading databases that hold rows of already deleted snapshots."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self._tmp.name) / "ts_activity.sqlite"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _open_and_check(self) -> Database:
+        db = Database(str(self.db_path))
+        self.addCleanup(db.close)
+
+        stats = db.get_database_stats()
+        self.assertEqual(stats['schema_version'], str(SCHEMA_VERSION))
+        self.assertEqual(stats['snapshot_count'], 2)
+        self.assertEqual(stats['client_snapshot_count'], 5)
+        self.assertEqual(stats['unique_clients'], 3)
+
+        with db.get_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA foreign_key_check").fetchall(), [])
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM client_snapshots").fetchone()[0], 5)
+        return db
+
+    def _check_counters_drain(self, db: Database) -> None:
+        # Trigger arithmetic must bring the counters back to zero
+        self.assertEqual(db.cleanup_old_data(retention_days=1), 2)
+        stats = db.get_database_stats()
+        self.assertEqual(stats['snapshot_count'], 0)
+        self.assertEqual(stats['client_snapshot_count'], 0)
+        self.assertEqual(stats['unique_clients'], 0)
+
+    def test_v5_upgrade_drops_orphans(self):
+        _seed_with_orphans(self.db_path, version=5)
+        self._check_counters_drain(self._open_and_check())
+
+    def test_v4_upgrade_backfills_without_orphans(self):
+        _seed_with_orphans(self.db_path, version=4)
+        self._check_counters_drain(self._open_and_check())
+
+
+
+class SchemaVersionTest(unittest.TestCase):
+    """Version stamping in the database file header."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self._tmp.name) / "ts_activity.sqlite"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _user_version(self) -> int:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_new_database_is_stamped(self):
+        Database(str(self.db_path)).close()
+        self.assertEqual(self._user_version(), SCHEMA_VERSION)
+
+    def test_newer_database_is_refused(self):
+        Database(str(self.db_path)).close()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        conn.close()
+
+        with self.assertRaises(RuntimeError):
+            Database(str(self.db_path))
+        self.assertEqual(self._user_version(), SCHEMA_VERSION + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,18 +7,31 @@ Copyright (C) 2025 Metroseksuaali
 Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 """
 
+import asyncio
+import copy
+import hashlib
+import hmac
 import logging
 import sys
+import time
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
 
+import anyio.to_thread
 import uvicorn
-from fastapi import Depends, FastAPI, HTTPException, Query, Response, Security
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, Security
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import APIKeyHeader, APIKeyQuery
-from pydantic import BaseModel
+from prometheus_client import CONTENT_TYPE_LATEST
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
+from ts_activity_bot.cache import cached_stats, single_flight
 from ts_activity_bot.config import get_config
 from ts_activity_bot.db import create_database
+from ts_activity_bot.db_base import DatabaseBackend
 from ts_activity_bot.stats import StatsCalculator
 from ts_activity_bot.graphql_schema import create_graphql_router, set_stats_calculator
 from ts_activity_bot.metrics import create_metrics_collector
@@ -37,8 +50,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize database backend (SQLite or PostgreSQL based on config)
-db = create_database(config)
+# Database backend (SQLite or PostgreSQL based on config).
+# Opened per process in lifespan() - connections must not be shared across
+# the forked gunicorn workers.
+db: Optional[DatabaseBackend] = None
+
+# Stats handlers are plain "def" endpoints running blocking SQLite queries in
+# the threadpool; raise anyio's default limit of 40 threads
+THREADPOOL_SIZE = 100
+
+# Stats only change once per poll, so cache endpoint results for one interval
+CACHE_TTL = config.polling.interval_seconds
 
 # Initialize stats calculator (always points at the SQLite analytics file)
 stats_calc: StatsCalculator = StatsCalculator(
@@ -53,10 +75,48 @@ if config.database.backend != "sqlite":
         config.database.backend,
     )
 
-set_stats_calculator(stats_calc)
+set_stats_calculator(stats_calc, cache_ttl=CACHE_TTL)
 
 # Initialize Prometheus metrics collector
-metrics_collector = create_metrics_collector(config)
+metrics_collector = create_metrics_collector(config, stats_calc)
+
+# Prometheus exposition body, rendered in the background once per poll so
+# scrapes don't pay for the collector queries
+_METRICS_CACHE: dict = {"body": None, "updated_at": 0.0}
+_PROM_MEDIA_TYPE = CONTENT_TYPE_LATEST
+
+
+async def _refresh_metrics_loop() -> None:
+    """Re-render the Prometheus metrics every polling interval."""
+    while True:
+        try:
+            _METRICS_CACHE["body"] = await run_in_threadpool(metrics_collector.get_metrics)
+            _METRICS_CACHE["updated_at"] = time.time()
+        except Exception as e:
+            logger.error(f"Failed to refresh metrics: {e}")
+        await asyncio.sleep(config.polling.interval_seconds)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open per-process resources on startup and release them on shutdown."""
+    global db
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    db = create_database(config)
+    try:
+        await run_in_threadpool(stats_calc.warm_up)
+    except Exception as e:
+        logger.warning(f"Could not warm up analytics database: {e}")
+    metrics_task = asyncio.create_task(_refresh_metrics_loop())
+    try:
+        yield
+    finally:
+        metrics_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await metrics_task
+        db.close()
+        db = None
+
 
 # Initialize FastAPI
 app = FastAPI(
@@ -64,9 +124,16 @@ app = FastAPI(
     description="REST API for querying TeamSpeak 3 (3.13+) and TeamSpeak 6 server activity statistics",
     version="2.0.0",
     docs_url="/docs" if config.api.docs_enabled else None,
-    redoc_url="/redoc" if config.api.docs_enabled else None
+    redoc_url="/redoc" if config.api.docs_enabled else None,
+    # Without docs the schema is never needed - don't expose or build it
+    openapi_url="/openapi.json" if config.api.docs_enabled else None,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Compress larger JSON lists and the Prometheus exposition body
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Mount GraphQL router when analytics backend is available
 graphql_router = create_graphql_router()
 if graphql_router is not None:
@@ -78,6 +145,14 @@ else:
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 api_key_query = APIKeyQuery(name="api_key", auto_error=False)
 
+# Resolved once at import; the token only changes with the config file
+_AUTH_TOKEN = config.api.get_auth_token().encode()
+
+
+def _is_valid_token(api_key: str) -> bool:
+    """Compare an API key against the configured token in constant time."""
+    return hmac.compare_digest(api_key.encode(), _AUTH_TOKEN)
+
 
 async def verify_api_key(
     api_key_header: str = Security(api_key_header),
@@ -89,20 +164,83 @@ async def verify_api_key(
     if not api_key:
         raise HTTPException(status_code=401, detail="API key required")
 
-    if api_key != config.api.get_auth_token():
+    if not _is_valid_token(api_key):
         raise HTTPException(status_code=403, detail="Invalid API key")
 
     return api_key
 
 
+# Shared endpoint parameters (defaults are given per endpoint)
+DaysQuery = Annotated[Optional[int], Query(description="Number of days to analyze")]
+AllTimeDaysQuery = Annotated[
+    Optional[int], Query(description="Number of days to analyze (null = all time)")
+]
+LimitQuery = Annotated[int, Query(ge=1, le=100, description="Maximum number of users")]
+
+
+# Endpoints whose responses only change when a new snapshot is stored
+CONDITIONAL_PATHS = ("/stats/", "/health", "/metrics")
+
+
+# Health checks only need the latest snapshot time; keep it briefly so
+# frequent load balancer probes don't each hit the database
+LAST_SNAPSHOT_TTL = 5
+
+
+@cached_stats(ttl=LAST_SNAPSHOT_TTL, maxsize=1)
+@single_flight
+def _get_last_snapshot_timestamp() -> Optional[int]:
+    """Get the latest snapshot timestamp, used by /health."""
+    return db.get_last_snapshot_timestamp()
+
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """
+    Add ETag/Cache-Control headers and answer repeated GETs with 304.
+
+    The ETag is a hash of the body actually served. Endpoint results come
+    from their own TTL caches, so a tag derived from the latest snapshot
+    could change while a stale body is still served (or the other way
+    round). Only successful responses are tagged, so unauthenticated
+    requests never get cached stats confirmed.
+    """
+    if request.method != "GET" or not request.url.path.startswith(CONDITIONAL_PATHS):
+        return await call_next(request)
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={CACHE_TTL}"}
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    response = Response(content=body, status_code=200, headers=dict(response.headers))
+    response.headers.update(headers)
+    return response
+
+
 # Response models
-class HealthResponse(BaseModel):
+# List endpoints serialize through a prebuilt TypeAdapter per model (see
+# _json_list_response) and reference the models for the OpenAPI docs.
+class ResponseModel(BaseModel):
+    """Base for API response models: immutable, extra stats keys are dropped."""
+
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+
+class HealthResponse(ResponseModel):
     status: str
     database: str
     last_snapshot: Optional[int] = None
 
 
-class UserStat(BaseModel):
+class UserStat(ResponseModel):
     client_uid: str
     nickname: str
     online_hours: float
@@ -110,33 +248,33 @@ class UserStat(BaseModel):
     last_seen: int
 
 
-class HourlyHeatmap(BaseModel):
+class HourlyHeatmap(ResponseModel):
     hour: int
     avg_clients: float
     sample_count: int
 
 
-class DailyActivity(BaseModel):
+class DailyActivity(ResponseModel):
     day_of_week: int
     day_name: str
     avg_clients: float
     sample_count: int
 
 
-class IdleUser(BaseModel):
+class IdleUser(ResponseModel):
     client_uid: str
     nickname: str
     avg_idle_ms: int
     avg_idle_minutes: float
 
 
-class PeakTime(BaseModel):
+class PeakTime(ResponseModel):
     timestamp: int
     datetime: str
     total_clients: int
 
 
-class ChannelStat(BaseModel):
+class ChannelStat(ResponseModel):
     channel_id: int
     channel_name: str
     total_visits: int
@@ -144,7 +282,7 @@ class ChannelStat(BaseModel):
     avg_idle_ms: int
 
 
-class GrowthMetrics(BaseModel):
+class GrowthMetrics(ResponseModel):
     period_days: int
     total_unique_users: int
     new_users: int
@@ -152,7 +290,7 @@ class GrowthMetrics(BaseModel):
     new_user_percentage: float
 
 
-class OnlineUser(BaseModel):
+class OnlineUser(ResponseModel):
     client_uid: str
     nickname: str
     channel_id: int
@@ -170,7 +308,7 @@ class OnlineUser(BaseModel):
     connected_hours: float
 
 
-class Summary(BaseModel):
+class Summary(ResponseModel):
     period_days: Optional[int]
     total_snapshots: int
     avg_users_online: float
@@ -178,7 +316,7 @@ class Summary(BaseModel):
     unique_users: int
 
 
-class DatabaseStats(BaseModel):
+class DatabaseStats(ResponseModel):
     db_size_mb: float
     snapshot_count: int
     client_snapshot_count: int
@@ -188,7 +326,7 @@ class DatabaseStats(BaseModel):
     schema_version: str
 
 
-class AwayUser(BaseModel):
+class AwayUser(ResponseModel):
     client_uid: str
     nickname: str
     total_samples: int
@@ -197,7 +335,7 @@ class AwayUser(BaseModel):
     last_away_message: str
 
 
-class AwayStats(BaseModel):
+class AwayStats(ResponseModel):
     period_days: Optional[int]
     total_samples: int
     away_samples: int
@@ -205,14 +343,14 @@ class AwayStats(BaseModel):
     top_away_users: list[AwayUser]
 
 
-class TopRecorder(BaseModel):
+class TopRecorder(ResponseModel):
     client_uid: str
     nickname: str
     recording_count: int
     recording_percentage: float
 
 
-class MuteStats(BaseModel):
+class MuteStats(ResponseModel):
     period_days: Optional[int]
     total_samples: int
     mic_muted_percentage: float
@@ -222,13 +360,13 @@ class MuteStats(BaseModel):
     top_recorders: list[TopRecorder]
 
 
-class ServerGroup(BaseModel):
+class ServerGroup(ResponseModel):
     group_id: str
     unique_members: int
     total_samples: int
 
 
-class ChannelHopper(BaseModel):
+class ChannelHopper(ResponseModel):
     client_uid: str
     nickname: str
     total_samples: int
@@ -236,21 +374,21 @@ class ChannelHopper(BaseModel):
     switches_per_hour: float
 
 
-class Reconnector(BaseModel):
+class Reconnector(ResponseModel):
     client_uid: str
     nickname: str
     session_count: int
     avg_session_length_minutes: float
 
 
-class ConnectionPatterns(BaseModel):
+class ConnectionPatterns(ResponseModel):
     period_days: Optional[int]
     total_users: int
     avg_online_time_hours: float
     top_reconnectors: list[Reconnector]
 
 
-class LTVUser(BaseModel):
+class LTVUser(ResponseModel):
     client_uid: str
     nickname: str
     ltv_score: int
@@ -268,7 +406,7 @@ class LTVUser(BaseModel):
     last_seen: int
 
 
-class LTVSummary(BaseModel):
+class LTVSummary(ResponseModel):
     period_days: Optional[int]
     total_users: int
     avg_ltv_score: float
@@ -280,18 +418,55 @@ class LTVSummary(BaseModel):
     casual_users_percent: float
 
 
+# List endpoints validate and serialize in one pass inside pydantic-core,
+# bypassing FastAPI's jsonable_encoder
+LTV_USERS_ADAPTER = TypeAdapter(list[LTVUser])
+USER_STATS_ADAPTER = TypeAdapter(list[UserStat])
+ONLINE_USERS_ADAPTER = TypeAdapter(list[OnlineUser])
+CHANNEL_STATS_ADAPTER = TypeAdapter(list[ChannelStat])
+HOURLY_HEATMAP_ADAPTER = TypeAdapter(list[HourlyHeatmap])
+DAILY_ACTIVITY_ADAPTER = TypeAdapter(list[DailyActivity])
+IDLE_USERS_ADAPTER = TypeAdapter(list[IdleUser])
+PEAK_TIMES_ADAPTER = TypeAdapter(list[PeakTime])
+SERVER_GROUPS_ADAPTER = TypeAdapter(list[ServerGroup])
+CHANNEL_HOPPERS_ADAPTER = TypeAdapter(list[ChannelHopper])
+
+
+class CachedJSONResponse(Response):
+    """Pre-serialized JSON response that may be cached and sent repeatedly."""
+
+    media_type = "application/json"
+
+    async def __call__(self, scope, receive, send) -> None:
+        # Middleware such as GZip edits the header list it is sent in
+        # place; send a copy so the cached instance stays untouched
+        response = copy.copy(self)
+        response.raw_headers = list(self.raw_headers)
+        await Response.__call__(response, scope, receive, send)
+
+
+def _json_list_response(adapter: TypeAdapter, rows: list) -> Response:
+    """
+    Build a JSON response for a list of stats rows using a prebuilt adapter.
+
+    Rows are always validated into their response model, which also drops
+    any keys the stats queries return besides the documented fields. The
+    endpoints cache the finished response, so this runs once per TTL.
+    """
+    return CachedJSONResponse(content=adapter.dump_json(adapter.validate_python(rows)))
+
+
 # Endpoints
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+def health_check():
     """Health check endpoint (no authentication required)."""
     try:
-        db_stats = db.get_database_stats()
         return {
             "status": "healthy",
             "database": "connected",
-            "last_snapshot": db_stats.get('last_snapshot_timestamp')
+            "last_snapshot": _get_last_snapshot_timestamp()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -303,7 +478,7 @@ async def health_check():
 
 
 @app.get("/metrics")
-async def metrics():
+def metrics():
     """
     Prometheus metrics endpoint (no authentication required).
 
@@ -319,63 +494,65 @@ async def metrics():
     ```
     """
     try:
-        from prometheus_client import CONTENT_TYPE_LATEST
-        metrics_data = metrics_collector.get_metrics()
-        return Response(content=metrics_data, media_type=CONTENT_TYPE_LATEST)
+        metrics_data = _METRICS_CACHE["body"]
+        if metrics_data is None:
+            # First scrape before the background refresh finished
+            metrics_data = metrics_collector.get_metrics()
+        return Response(content=metrics_data, media_type=_PROM_MEDIA_TYPE)
     except Exception as e:
         logger.error(f"Error generating metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/stats/summary", response_model=Summary)
-async def get_summary(
-    days: Optional[int] = Query(7, description="Number of days to analyze (null = all time)"),
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_summary(
+    days: AllTimeDaysQuery = 7,
     api_key: str = Depends(verify_api_key)
 ):
     """Get overall statistics summary."""
     try:
-        stats = stats_calc
-        return stats.get_summary(days=days)
+        return stats_calc.get_summary(days=days)
     except Exception as e:
         logger.error(f"Error getting summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/top-users", response_model=list[UserStat])
-async def get_top_users(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
-    limit: int = Query(10, ge=1, le=100, description="Maximum number of users"),
+@app.get("/stats/top-users", responses={200: {"model": list[UserStat]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_top_users(
+    days: DaysQuery = 7,
+    limit: LimitQuery = 10,
     api_key: str = Depends(verify_api_key)
 ):
     """Get top users by online time."""
     try:
-        stats = stats_calc
-        users = stats.get_top_users(days=days, limit=limit)
-        return [
-            {
-                'client_uid': u['client_uid'],
-                'nickname': u['nickname'],
-                'online_hours': u['online_hours'],
-                'first_seen': u['first_seen'],
-                'last_seen': u['last_seen']
-            }
-            for u in users
-        ]
+        return _json_list_response(
+            USER_STATS_ADAPTER, stats_calc.get_top_users(days=days, limit=limit)
+        )
     except Exception as e:
         logger.error(f"Error getting top users: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@cached_stats(ttl=CACHE_TTL, maxsize=1024)
+@single_flight
+def _get_user_stats(client_uid: str, days: Optional[int]) -> Optional[dict]:
+    """Per-user stats lookup with its own, larger cache (lookups recur per uid)."""
+    return stats_calc.get_user_stats(client_uid, days=days)
+
+
 @app.get("/stats/user/{client_uid}")
-async def get_user_stats(
+def get_user_stats(
     client_uid: str,
-    days: Optional[int] = Query(30, description="Number of days to analyze"),
+    days: DaysQuery = 30,
     api_key: str = Depends(verify_api_key)
 ):
     """Get detailed statistics for a specific user."""
     try:
-        stats = stats_calc
-        user = stats.get_user_stats(client_uid, days=days)
+        user = _get_user_stats(client_uid, days)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return user
@@ -386,107 +563,120 @@ async def get_user_stats(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/hourly-heatmap", response_model=list[HourlyHeatmap])
-async def get_hourly_heatmap(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
+@app.get("/stats/hourly-heatmap", responses={200: {"model": list[HourlyHeatmap]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_hourly_heatmap(
+    days: DaysQuery = 7,
     api_key: str = Depends(verify_api_key)
 ):
     """Get average user count by hour of day."""
     try:
-        stats = stats_calc
-        return stats.get_hourly_heatmap(days=days)
+        return _json_list_response(HOURLY_HEATMAP_ADAPTER, stats_calc.get_hourly_heatmap(days=days))
     except Exception as e:
         logger.error(f"Error getting hourly heatmap: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/daily-activity", response_model=list[DailyActivity])
-async def get_daily_activity(
-    days: Optional[int] = Query(30, description="Number of days to analyze"),
+@app.get("/stats/daily-activity", responses={200: {"model": list[DailyActivity]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_daily_activity(
+    days: DaysQuery = 30,
     api_key: str = Depends(verify_api_key)
 ):
     """Get average user count by day of week."""
     try:
-        stats = stats_calc
-        return stats.get_daily_activity(days=days)
+        return _json_list_response(DAILY_ACTIVITY_ADAPTER, stats_calc.get_daily_activity(days=days))
     except Exception as e:
         logger.error(f"Error getting daily activity: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/top-idle", response_model=list[IdleUser])
-async def get_top_idle(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
-    limit: int = Query(10, ge=1, le=100, description="Maximum number of users"),
+@app.get("/stats/top-idle", responses={200: {"model": list[IdleUser]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_top_idle(
+    days: DaysQuery = 7,
+    limit: LimitQuery = 10,
     api_key: str = Depends(verify_api_key)
 ):
     """Get users with highest average idle time."""
     try:
-        stats = stats_calc
-        return stats.get_top_idle_users(days=days, limit=limit)
+        return _json_list_response(
+            IDLE_USERS_ADAPTER, stats_calc.get_top_idle_users(days=days, limit=limit)
+        )
     except Exception as e:
         logger.error(f"Error getting top idle users: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/peak-times", response_model=list[PeakTime])
-async def get_peak_times(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
-    limit: int = Query(10, ge=1, le=100, description="Number of peak times"),
+@app.get("/stats/peak-times", responses={200: {"model": list[PeakTime]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_peak_times(
+    days: DaysQuery = 7,
+    limit: Annotated[int, Query(ge=1, le=100, description="Number of peak times")] = 10,
     api_key: str = Depends(verify_api_key)
 ):
     """Get times when server had most users online."""
     try:
-        stats = stats_calc
-        return stats.get_peak_times(days=days, limit=limit)
+        return _json_list_response(
+            PEAK_TIMES_ADAPTER, stats_calc.get_peak_times(days=days, limit=limit)
+        )
     except Exception as e:
         logger.error(f"Error getting peak times: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/channels", response_model=list[ChannelStat])
-async def get_channel_stats(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
+@app.get("/stats/channels", responses={200: {"model": list[ChannelStat]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_channel_stats(
+    days: DaysQuery = 7,
     api_key: str = Depends(verify_api_key)
 ):
     """Get channel popularity statistics."""
     try:
-        stats = stats_calc
-        return stats.get_channel_stats(days=days)
+        return _json_list_response(CHANNEL_STATS_ADAPTER, stats_calc.get_channel_stats(days=days))
     except Exception as e:
         logger.error(f"Error getting channel stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/stats/growth", response_model=GrowthMetrics)
-async def get_growth(
-    days: int = Query(7, ge=1, description="Number of days to analyze"),
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_growth(
+    days: Annotated[int, Query(ge=1, description="Number of days to analyze")] = 7,
     api_key: str = Depends(verify_api_key)
 ):
     """Get growth metrics (new vs returning users)."""
     try:
-        stats = stats_calc
-        return stats.get_growth_metrics(days=days)
+        return stats_calc.get_growth_metrics(days=days)
     except Exception as e:
         logger.error(f"Error getting growth metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/online-now", response_model=list[OnlineUser])
-async def get_online_now(
+@app.get("/stats/online-now", responses={200: {"model": list[OnlineUser]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_online_now(
     api_key: str = Depends(verify_api_key)
 ):
     """Get currently online users (from last snapshot)."""
     try:
-        stats = stats_calc
-        return stats.get_online_now()
+        return _json_list_response(ONLINE_USERS_ADAPTER, stats_calc.get_online_now())
     except Exception as e:
         logger.error(f"Error getting online users: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/stats/database", response_model=DatabaseStats)
-async def get_database_stats(
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_database_stats(
     api_key: str = Depends(verify_api_key)
 ):
     """Get database statistics."""
@@ -498,82 +688,93 @@ async def get_database_stats(
 
 
 @app.get("/stats/away", response_model=AwayStats)
-async def get_away_stats(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
-    limit: int = Query(10, ge=1, le=100, description="Number of users to show"),
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_away_stats(
+    days: DaysQuery = 7,
+    limit: LimitQuery = 10,
     api_key: str = Depends(verify_api_key)
 ):
     """Get AFK/Away status statistics."""
     try:
-        stats = stats_calc
-        return stats.get_away_stats(days=days, limit=limit)
+        return stats_calc.get_away_stats(days=days, limit=limit)
     except Exception as e:
         logger.error(f"Error getting away stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/stats/mute", response_model=MuteStats)
-async def get_mute_stats(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_mute_stats(
+    days: DaysQuery = 7,
     api_key: str = Depends(verify_api_key)
 ):
     """Get microphone/speaker mute and recording statistics."""
     try:
-        stats = stats_calc
-        return stats.get_mute_stats(days=days)
+        return stats_calc.get_mute_stats(days=days)
     except Exception as e:
         logger.error(f"Error getting mute stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/server-groups", response_model=list[ServerGroup])
-async def get_server_groups(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
+@app.get("/stats/server-groups", responses={200: {"model": list[ServerGroup]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_server_groups(
+    days: DaysQuery = 7,
     api_key: str = Depends(verify_api_key)
 ):
     """Get server group membership statistics."""
     try:
-        stats = stats_calc
-        return stats.get_server_group_stats(days=days)
+        return _json_list_response(
+            SERVER_GROUPS_ADAPTER, stats_calc.get_server_group_stats(days=days)
+        )
     except Exception as e:
         logger.error(f"Error getting server group stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/channel-hoppers", response_model=list[ChannelHopper])
-async def get_channel_hoppers(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
-    limit: int = Query(10, ge=1, le=100, description="Number of users to show"),
+@app.get("/stats/channel-hoppers", responses={200: {"model": list[ChannelHopper]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_channel_hoppers(
+    days: DaysQuery = 7,
+    limit: LimitQuery = 10,
     api_key: str = Depends(verify_api_key)
 ):
     """Get users who switch channels most frequently."""
     try:
-        stats = stats_calc
-        return stats.get_channel_switches(days=days, limit=limit)
+        return _json_list_response(
+            CHANNEL_HOPPERS_ADAPTER, stats_calc.get_channel_switches(days=days, limit=limit)
+        )
     except Exception as e:
         logger.error(f"Error getting channel hoppers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/stats/connection-patterns", response_model=ConnectionPatterns)
-async def get_connection_patterns(
-    days: Optional[int] = Query(7, description="Number of days to analyze"),
-    limit: int = Query(10, ge=1, le=100, description="Number of users to show"),
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_connection_patterns(
+    days: DaysQuery = 7,
+    limit: LimitQuery = 10,
     api_key: str = Depends(verify_api_key)
 ):
     """Get connection/disconnection patterns and session statistics."""
     try:
-        stats = stats_calc
-        return stats.get_connection_patterns(days=days, limit=limit)
+        return stats_calc.get_connection_patterns(days=days, limit=limit)
     except Exception as e:
         logger.error(f"Error getting connection patterns: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/stats/lifetime-value", response_model=list[LTVUser])
-async def get_lifetime_value(
-    days: Optional[int] = Query(None, description="Number of days to analyze (null = all time)"),
-    limit: int = Query(50, ge=1, le=500, description="Maximum number of users"),
+@app.get("/stats/lifetime-value", responses={200: {"model": list[LTVUser]}})
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_lifetime_value(
+    days: AllTimeDaysQuery = None,
+    limit: Annotated[int, Query(ge=1, le=500, description="Maximum number of users")] = 50,
     api_key: str = Depends(verify_api_key)
 ):
     """
@@ -591,42 +792,125 @@ async def get_lifetime_value(
     - Casual User (0-49 score)
     """
     try:
-        stats = stats_calc
-        return stats.get_user_lifetime_value(days=days, limit=limit)
+        users = stats_calc.get_user_lifetime_value(days=days, limit=limit)
+        return _json_list_response(LTV_USERS_ADAPTER, users)
     except Exception as e:
         logger.error(f"Error getting LTV: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/stats/lifetime-value/summary", response_model=LTVSummary)
-async def get_ltv_summary(
-    days: Optional[int] = Query(None, description="Number of days to analyze (null = all time)"),
+@cached_stats(ttl=CACHE_TTL)
+@single_flight
+def get_ltv_summary(
+    days: AllTimeDaysQuery = None,
     api_key: str = Depends(verify_api_key)
 ):
     """Get User Lifetime Value distribution summary."""
     try:
-        stats = stats_calc
-        return stats.get_ltv_summary(days=days)
+        return stats_calc.get_ltv_summary(days=days)
     except Exception as e:
         logger.error(f"Error getting LTV summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _server_impls() -> dict:
+    """
+    Pick uvicorn's event loop and HTTP parser implementations.
+
+    uvicorn's "auto" mode silently falls back to asyncio/h11 when the faster
+    implementations are missing, so select them explicitly and log a warning
+    when we have to fall back.
+
+    Returns:
+        Keyword arguments for uvicorn.run() or UvicornWorker.CONFIG_KWARGS
+    """
+    impls = {"loop": "asyncio", "http": "h11"}
+
+    try:
+        import uvloop  # noqa: F401
+        impls["loop"] = "uvloop"
+    except ImportError:
+        logger.warning("uvloop not installed, falling back to the asyncio event loop")
+
+    try:
+        import httptools  # noqa: F401
+        impls["http"] = "httptools"
+    except ImportError:
+        logger.warning("httptools not installed, falling back to the h11 HTTP parser")
+
+    return impls
+
+
+def _run_gunicorn(workers: int, impls: dict) -> bool:
+    """
+    Serve the app with gunicorn and multiple uvicorn worker processes.
+
+    Args:
+        workers: Number of worker processes
+        impls: Event loop and HTTP parser selection from _server_impls()
+
+    Returns:
+        False if gunicorn is not available, otherwise blocks until shutdown
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+        from ts_activity_bot.gunicorn_worker import ApiWorker
+    except ImportError:
+        logger.warning("gunicorn not installed, falling back to a single uvicorn worker")
+        return False
+
+    # Inherited by the forked workers
+    ApiWorker.CONFIG_KWARGS.update(impls)
+
+    class GunicornApplication(BaseApplication):
+        """Embedded gunicorn application serving the FastAPI app."""
+
+        def __init__(self, application, options: dict):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    GunicornApplication(app, {
+        "bind": f"{config.api.host}:{config.api.port}",
+        "workers": workers,
+        "worker_class": "ts_activity_bot.gunicorn_worker.ApiWorker",
+        "loglevel": config.logging.level.lower(),
+    }).run()
+    return True
+
+
 def main():
     """Run the API server."""
+    impls = _server_impls()
+    workers = config.api.get_worker_count()
+
     logger.info("=" * 60)
     logger.info("TeamSpeak Activity Stats Bot - API Server")
     logger.info("=" * 60)
     logger.info(f"Host: {config.api.host}")
     logger.info(f"Port: {config.api.port}")
     logger.info(f"Docs: {'/docs' if config.api.docs_enabled else 'disabled'}")
+    logger.info(f"Event loop: {impls['loop']}, HTTP parser: {impls['http']}")
+    logger.info(f"Workers: {workers}")
     logger.info("=" * 60)
 
+    if workers > 1 and _run_gunicorn(workers, impls):
+        return
+
     uvicorn.run(
         app,
         host=config.api.host,
         port=config.api.port,
-        log_level=config.logging.level.lower()
+        log_level=config.logging.level.lower(),
+        **impls
     )
 
 
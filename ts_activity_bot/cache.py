@@ -0,0 +1,116 @@
+"""
+Response caching for TS6 Activity Bot API.
+
+Statistics only change when the poller stores a new snapshot, so results can
+be reused for one polling interval instead of re-running the analytics SQL
+for every dashboard refresh or scrape.
+
+Copyright (C) 2025 Metroseksuaali
+Licensed under GNU AGPL v3.0 - see LICENSE file for details.
+"""
+
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from cachetools import TTLCache
+
+# Keyword arguments that do not affect the result (authentication)
+_IGNORED_KWARGS = frozenset({"api_key"})
+
+
+def _make_key(args: tuple, kwargs: Dict[str, Any]) -> Hashable:
+    """Build a cache key from call arguments, skipping ignored kwargs."""
+    return (args, tuple(sorted(
+        (name, value) for name, value in kwargs.items()
+        if name not in _IGNORED_KWARGS
+    )))
+
+
+def cached_stats(ttl: float, maxsize: int = 256) -> Callable:
+    """
+    Cache a function's return value for a limited time.
+
+    Each decorated function gets its own cache keyed by its arguments
+    (authentication arguments excluded). Exceptions are not cached.
+    The wrapper keeps the original signature, so it can decorate FastAPI
+    endpoints directly.
+
+    Args:
+        ttl: Time to live for cached results in seconds
+        maxsize: Maximum number of cached argument combinations
+
+    Returns:
+        Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = _make_key(args, kwargs)
+
+            with lock:
+                try:
+                    return cache[key]
+                except KeyError:
+                    pass
+
+            result = func(*args, **kwargs)
+
+            with lock:
+                cache[key] = result
+            return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
+
+
+def single_flight(func: Callable) -> Callable:
+    """
+    Collapse concurrent calls with the same arguments into one.
+
+    The first caller runs the function; callers arriving while it is still
+    running wait for and share its result (or exception). Combined with
+    cached_stats() this prevents a burst of requests from all running the
+    same query when a cache entry expires.
+
+    Args:
+        func: Function to wrap
+
+    Returns:
+        Wrapped function
+    """
+    inflight: Dict[Hashable, Future] = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key = _make_key(args, kwargs)
+
+        with lock:
+            future = inflight.get(key)
+            leader = future is None
+            if leader:
+                future = inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with lock:
+                del inflight[key]
+
+    return wrapper
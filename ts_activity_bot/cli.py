@@ -8,21 +8,37 @@ Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 """
 
 import sys
-from datetime import datetime
+import time
+from functools import lru_cache
 
 import click
 from rich.console import Console
-from rich.table import Table
 
+from ts_activity_bot import __version__
 from ts_activity_bot.config import get_config
-from ts_activity_bot.stats import StatsCalculator
 
 console = Console()
 
+# Activity bars for heatmap-style tables, indexed by length
+BAR_WIDTH = 30
+BARS = tuple("█" * length for length in range(BAR_WIDTH + 1))
 
+
+def new_table():
+    """Create a results table (rich.table is imported only when needed)."""
+    from rich.table import Table
+
+    return Table(show_header=True, header_style="bold cyan")
+
+
+@lru_cache(maxsize=8192)
 def format_timestamp(ts: int) -> str:
-    """Format Unix timestamp to readable string."""
-    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+    """Format Unix timestamp to readable string (memoized, rows share snapshot times)."""
+    t = time.localtime(ts)
+    return (
+        f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} "
+        f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+    )
 
 
 def format_duration(hours: float) -> str:
@@ -36,18 +52,63 @@ def format_duration(hours: float) -> str:
         return f"{days:.1f}d"
 
 
+def _format_top_user_row(rank: int, user: dict) -> tuple:
+    """Build the cells of one top-users table row."""
+    return (
+        f"{rank}",
+        user['nickname'],
+        format_duration(user['online_hours']),
+        format_timestamp(user['first_seen']),
+        format_timestamp(user['last_seen'])
+    )
+
+
+class CliState:
+    """
+    Per-invocation CLI state.
+
+    Config and stats calculator are set up on first use, so "<command> --help"
+    (which still runs the group callback) never loads the config or opens
+    the database.
+    """
+
+    def __init__(self, config_path: str):
+        self.config_path = config_path
+        self._config = None
+        self._stats = None
+
+    def _setup(self) -> None:
+        """Load config and create the stats calculator, exiting on failure."""
+        try:
+            from ts_activity_bot.stats import StatsCalculator
+
+            config = get_config(self.config_path)
+            self._stats = StatsCalculator(config.database.path, config.polling.interval_seconds)
+            self._config = config
+        except Exception as e:
+            console.print(f"[red]Error loading configuration: {e}[/red]")
+            sys.exit(1)
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._setup()
+        return self._config
+
+    @property
+    def stats(self):
+        if self._stats is None:
+            self._setup()
+        return self._stats
+
+
 @click.group()
+@click.version_option(__version__, prog_name='ts-activity-bot')
 @click.option('--config', default='config.yaml', help='Path to config file')
 @click.pass_context
 def cli(ctx, config):
     """TeamSpeak Activity Stats Bot - CLI Interface (TS3 3.13+ & TS6)"""
-    try:
-        cfg = get_config(config)
-        stats = StatsCalculator(cfg.database.path, cfg.polling.interval_seconds)
-        ctx.obj = {'config': cfg, 'stats': stats}
-    except Exception as e:
-        console.print(f"[red]Error loading configuration: {e}[/red]")
-        sys.exit(1)
+    ctx.obj = CliState(config)
 
 
 @cli.command()
@@ -56,7 +117,7 @@ def cli(ctx, config):
 @click.pass_context
 def top_users(ctx, days, limit):
     """Show top users by online time."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Top {limit} Users - Last {days} Days[/bold]\n")
 
@@ -67,7 +128,7 @@ def top_users(ctx, days, limit):
             console.print("[yellow]No data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("#", style="dim", width=3)
         table.add_column("Nickname")
         table.add_column("Online Time", justify="right")
@@ -75,13 +136,7 @@ def top_users(ctx, days, limit):
         table.add_column("Last Seen", justify="right")
 
         for i, user in enumerate(users, 1):
-            table.add_row(
-                str(i),
-                user['nickname'],
-                format_duration(user['online_hours']),
-                format_timestamp(user['first_seen']),
-                format_timestamp(user['last_seen'])
-            )
+            table.add_row(*_format_top_user_row(i, user))
 
         console.print(table)
 
@@ -96,7 +151,7 @@ def top_users(ctx, days, limit):
 @click.pass_context
 def user_stats(ctx, client_uid, days):
     """Show detailed statistics for a specific user."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     try:
         user = stats.get_user_stats(client_uid, days=days)
@@ -117,12 +172,12 @@ def user_stats(ctx, client_uid, days):
         # Favorite channels
         if user['favorite_channels']:
             console.print("\n[bold]Favorite Channels:[/bold]")
-            table = Table(show_header=True, header_style="bold cyan")
+            table = new_table()
             table.add_column("Channel ID", justify="right")
             table.add_column("Visits", justify="right")
 
             for ch in user['favorite_channels']:
-                table.add_row(str(ch['channel_id']), str(ch['visits']))
+                table.add_row(f"{ch['channel_id']}", f"{ch['visits']}")
 
             console.print(table)
 
@@ -143,7 +198,7 @@ def user_stats(ctx, client_uid, days):
 @click.pass_context
 def hourly_heatmap(ctx, days):
     """Show hourly activity heatmap."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Hourly Activity Heatmap - Last {days} Days[/bold]\n")
 
@@ -154,7 +209,7 @@ def hourly_heatmap(ctx, days):
             console.print("[yellow]No data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("Hour", justify="right")
         table.add_column("Avg Users", justify="right")
         table.add_column("Activity Bar")
@@ -164,8 +219,8 @@ def hourly_heatmap(ctx, days):
         for h in heatmap:
             hour_str = f"{h['hour']:02d}:00"
             avg_users = h['avg_clients']
-            bar_length = int((avg_users / max_users) * 30) if max_users > 0 else 0
-            bar = "█" * bar_length
+            bar_length = int((avg_users / max_users) * BAR_WIDTH) if max_users > 0 else 0
+            bar = BARS[bar_length]
 
             table.add_row(hour_str, f"{avg_users:.1f}", bar)
 
@@ -181,7 +236,7 @@ def hourly_heatmap(ctx, days):
 @click.pass_context
 def daily_activity(ctx, days):
     """Show activity by day of week."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Daily Activity - Last {days} Days[/bold]\n")
 
@@ -192,7 +247,7 @@ def daily_activity(ctx, days):
             console.print("[yellow]No data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("Day", width=12)
         table.add_column("Avg Users", justify="right")
         table.add_column("Activity Bar")
@@ -201,8 +256,8 @@ def daily_activity(ctx, days):
 
         for d in activity:
             avg_users = d['avg_clients']
-            bar_length = int((avg_users / max_users) * 30) if max_users > 0 else 0
-            bar = "█" * bar_length
+            bar_length = int((avg_users / max_users) * BAR_WIDTH) if max_users > 0 else 0
+            bar = BARS[bar_length]
 
             table.add_row(d['day_name'], f"{avg_users:.1f}", bar)
 
@@ -219,7 +274,7 @@ def daily_activity(ctx, days):
 @click.pass_context
 def top_idle(ctx, days, limit):
     """Show top idle users (AFK champions)."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Top {limit} Idle Users - Last {days} Days[/bold]\n")
 
@@ -230,7 +285,7 @@ def top_idle(ctx, days, limit):
             console.print("[yellow]No data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("#", style="dim", width=3)
         table.add_column("Nickname")
         table.add_column("Avg Idle Time", justify="right")
@@ -255,7 +310,7 @@ def top_idle(ctx, days, limit):
 @click.pass_context
 def peak_times(ctx, days, limit):
     """Show server peak times."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Top {limit} Peak Times - Last {days} Days[/bold]\n")
 
@@ -266,7 +321,7 @@ def peak_times(ctx, days, limit):
             console.print("[yellow]No data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("#", style="dim", width=3)
         table.add_column("DateTime")
         table.add_column("Users Online", justify="right")
@@ -290,24 +345,24 @@ def peak_times(ctx, days, limit):
 @click.pass_context
 def channel_stats(ctx, days):
     """Show channel popularity statistics."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Channel Statistics - Last {days} Days[/bold]\n")
 
     try:
-        channels = stats.get_channel_stats(days=days)
+        channels = stats.get_channel_stats(days=days, limit=20)  # Top 20
 
         if not channels:
             console.print("[yellow]No data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("Channel ID", justify="right")
         table.add_column("Total Visits", justify="right")
         table.add_column("Unique Users", justify="right")
         table.add_column("Avg Idle (min)", justify="right")
 
-        for ch in channels[:20]:  # Limit to top 20
+        for ch in channels:
             table.add_row(
                 str(ch['channel_id']),
                 str(ch['total_visits']),
@@ -327,7 +382,7 @@ def channel_stats(ctx, days):
 @click.pass_context
 def growth(ctx, days):
     """Show growth metrics (new vs returning users)."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Growth Metrics - Last {days} Days[/bold]\n")
 
@@ -348,7 +403,7 @@ def growth(ctx, days):
 @click.pass_context
 def online_now(ctx, detailed):
     """Show currently online users."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print("\n[bold]Currently Online Users[/bold]\n")
 
@@ -359,7 +414,7 @@ def online_now(ctx, detailed):
             console.print("[yellow]No users online (or no data yet)[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("Nickname")
         table.add_column("Channel", justify="right")
         table.add_column("Idle", justify="right")
@@ -407,7 +462,7 @@ def online_now(ctx, detailed):
 @click.pass_context
 def summary(ctx, days):
     """Show overall statistics summary."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Statistics Summary - Last {days} Days[/bold]\n")
 
@@ -430,7 +485,7 @@ def db_stats(ctx):
     """Show database statistics."""
     from ts_activity_bot.db import Database
 
-    config = ctx.obj['config']
+    config = ctx.obj.config
     db = Database(config.database.path)
 
     console.print("\n[bold]Database Statistics[/bold]\n")
@@ -461,7 +516,7 @@ def db_stats(ctx):
 @click.pass_context
 def away_stats(ctx, days, limit):
     """Show AFK/Away status statistics."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Away/AFK Statistics - Last {days} Days[/bold]\n")
 
@@ -473,7 +528,7 @@ def away_stats(ctx, days, limit):
 
         if away['top_away_users']:
             console.print("[bold]Top Away Users:[/bold]")
-            table = Table(show_header=True, header_style="bold cyan")
+            table = new_table()
             table.add_column("#", style="dim", width=3)
             table.add_column("Nickname")
             table.add_column("Away %", justify="right")
@@ -501,7 +556,7 @@ def away_stats(ctx, days, limit):
 @click.pass_context
 def mute_stats(ctx, days):
     """Show microphone/speaker mute and recording statistics."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Mute/Recording Statistics - Last {days} Days[/bold]\n")
 
@@ -516,7 +571,7 @@ def mute_stats(ctx, days):
 
         if mute['top_recorders']:
             console.print("[bold]Top Recorders:[/bold]")
-            table = Table(show_header=True, header_style="bold cyan")
+            table = new_table()
             table.add_column("#", style="dim", width=3)
             table.add_column("Nickname")
             table.add_column("Recording %", justify="right")
@@ -542,7 +597,7 @@ def mute_stats(ctx, days):
 @click.pass_context
 def server_groups(ctx, days):
     """Show server group membership statistics."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Server Group Statistics - Last {days} Days[/bold]\n")
 
@@ -553,7 +608,7 @@ def server_groups(ctx, days):
             console.print("[yellow]No server group data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("Group ID", justify="right")
         table.add_column("Unique Members", justify="right")
         table.add_column("Total Samples", justify="right")
@@ -578,7 +633,7 @@ def server_groups(ctx, days):
 @click.pass_context
 def channel_hoppers(ctx, days, limit):
     """Show users who switch channels most frequently."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Top {limit} Channel Hoppers - Last {days} Days[/bold]\n")
 
@@ -589,7 +644,7 @@ def channel_hoppers(ctx, days, limit):
             console.print("[yellow]No channel switching data available[/yellow]")
             return
 
-        table = Table(show_header=True, header_style="bold cyan")
+        table = new_table()
         table.add_column("#", style="dim", width=3)
         table.add_column("Nickname")
         table.add_column("Switches", justify="right")
@@ -616,7 +671,7 @@ def channel_hoppers(ctx, days, limit):
 @click.pass_context
 def connection_patterns(ctx, days, limit):
     """Show connection/disconnection patterns and session statistics."""
-    stats = ctx.obj['stats']
+    stats = ctx.obj.stats
 
     console.print(f"\n[bold]Connection Patterns - Last {days} Days[/bold]\n")
 
@@ -628,7 +683,7 @@ def connection_patterns(ctx, days, limit):
 
         if patterns['top_reconnectors']:
             console.print("[bold]Most Frequent Reconnectors:[/bold]")
-            table = Table(show_header=True, header_style="bold cyan")
+            table = new_table()
             table.add_column("#", style="dim", width=3)
             table.add_column("Nickname")
             table.add_column("Sessions", justify="right")
@@ -667,14 +722,14 @@ def lifetime_value(ctx, days, limit):
     Users are categorized as Power User (80+), Regular (50-79), or Casual (0-49).
     """
     try:
-        stats = ctx.obj['stats']
+        stats = ctx.obj.stats
         users = stats.get_user_lifetime_value(days=days, limit=limit)
 
         if users:
             period_text = f"last {days} days" if days else "all time"
             console.print(f"\n[bold cyan]User Lifetime Value Rankings[/bold cyan] ({period_text})\n")
 
-            table = Table(show_header=True, header_style="bold cyan")
+            table = new_table()
             table.add_column("#", style="dim", width=3)
             table.add_column("Nickname", min_width=15)
             table.add_column("LTV Score", justify="right", style="bold")
@@ -720,7 +775,7 @@ def lifetime_value(ctx, days, limit):
 def ltv_summary(ctx, days):
     """Show User Lifetime Value distribution summary."""
     try:
-        stats = ctx.obj['stats']
+        stats = ctx.obj.stats
         summary = stats.get_ltv_summary(days=days)
 
         if summary['total_users'] > 0:
@@ -732,7 +787,7 @@ def ltv_summary(ctx, days):
             console.print(f"Average LTV Score: [bold]{summary['avg_ltv_score']}[/bold]\n")
 
             # Category breakdown table
-            table = Table(show_header=True, header_style="bold cyan")
+            table = new_table()
             table.add_column("Category", style="bold")
             table.add_column("Count", justify="right")
             table.add_column("Percentage", justify="right")
@@ -7,8 +7,11 @@ Copyright (C) 2025 Metroseksuaali
 Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 """
 
+import hashlib
+import json
 import os
 import sys
+import tempfile
 from pathlib import Path
 from typing import Optional
 
@@ -16,6 +19,12 @@ import yaml
 from pydantic import BaseModel, Field, field_validator
 from pydantic_settings import BaseSettings
 
+# libyaml's C loader when available, pure-Python fallback otherwise
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 
 class TeamspeakConfig(BaseModel):
     """TeamSpeak server connection settings."""
@@ -113,6 +122,7 @@ class APIConfig(BaseModel):
     host: str = Field("0.0.0.0", description="Server host binding")
     port: int = Field(8080, description="Server port")
     docs_enabled: bool = Field(True, description="Enable auto-generated API docs")
+    workers: int = Field(1, description="API worker processes (0 = auto: 2 * CPU cores + 1)")
 
     @field_validator("port")
     @classmethod
@@ -122,6 +132,25 @@ class APIConfig(BaseModel):
             raise ValueError("port must be between 1 and 65535")
         return v
 
+    @field_validator("workers")
+    @classmethod
+    def validate_workers(cls, v: int) -> int:
+        """Ensure worker count is not negative."""
+        if v < 0:
+            raise ValueError("workers must be >= 0 (0 = auto)")
+        return v
+
+    def get_worker_count(self) -> int:
+        """
+        Get the effective number of API worker processes.
+
+        Returns:
+            Configured worker count, or 2 * CPU cores + 1 when set to 0 (auto)
+        """
+        if self.workers == 0:
+            return 2 * (os.cpu_count() or 1) + 1
+        return self.workers
+
     def get_auth_token(self) -> str:
         """
         Get authentication token with backward compatibility.
@@ -145,6 +174,95 @@ class Config(BaseSettings):
     api: APIConfig
 
 
+# Bump when the Config models change so stale caches are re-validated
+_CONFIG_CACHE_VERSION = 2
+
+
+def _get_cache_path(config_file: Path) -> Path:
+    """Get the path of the parsed-config cache next to the YAML file."""
+    return config_file.with_name(f".{config_file.name}.cache")
+
+
+def _get_settings_env_digest() -> str:
+    """
+    Hash the environment variables BaseSettings merges into the config.
+
+    Config reads one variable per section (TEAMSPEAK, API, ...; case
+    insensitive), so a cached config is only valid while they are unchanged.
+    """
+    env = sorted(
+        (name, value) for name, value in os.environ.items()
+        if name.lower() in Config.model_fields
+    )
+    return hashlib.sha256(json.dumps(env).encode()).hexdigest()
+
+
+def _load_cached_config(config_file: Path, file_stat: os.stat_result) -> Optional[Config]:
+    """
+    Load the validated configuration from cache.
+
+    The cached values were validated when they were stored, so the models
+    are built with model_construct() and validators are not run again.
+
+    Args:
+        config_file: YAML configuration file
+        file_stat: Current stat of the YAML file
+
+    Returns:
+        Config: Cached configuration, or None if missing, stale or unreadable
+    """
+    try:
+        with open(_get_cache_path(config_file), 'r') as f:
+            cached = json.load(f)
+
+        if (cached['version'] != _CONFIG_CACHE_VERSION
+                or cached['mtime_ns'] != file_stat.st_mtime_ns
+                or cached['size'] != file_stat.st_size
+                or cached['env'] != _get_settings_env_digest()):
+            return None
+
+        return Config.model_construct(**{
+            name: Config.model_fields[name].annotation.model_construct(**section)
+            for name, section in cached['config'].items()
+        })
+
+    except Exception:
+        return None
+
+
+def _store_cached_config(config_file: Path, file_stat: os.stat_result, config: Config) -> None:
+    """
+    Cache the validated configuration.
+
+    The cache is keyed by the YAML file's mtime and size and by the
+    environment variables that were merged into the config.
+
+    The cache holds secrets, so it is created owner-only (mkstemp uses 0600).
+    Failures (e.g. a read-only directory) are ignored.
+
+    Args:
+        config_file: YAML configuration file
+        file_stat: Stat of the YAML file the config was parsed from
+        config: Validated configuration
+    """
+    cache_file = _get_cache_path(config_file)
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=cache_file.parent, prefix=cache_file.name)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'version': _CONFIG_CACHE_VERSION,
+                'mtime_ns': file_stat.st_mtime_ns,
+                'size': file_stat.st_size,
+                'env': _get_settings_env_digest(),
+                'config': config.model_dump(mode='json'),
+            }, f)
+        os.replace(tmp_path, cache_file)
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
 def load_config(config_path: str = "config.yaml") -> Config:
     """
     Load configuration from YAML file.
@@ -166,14 +284,22 @@ def load_config(config_path: str = "config.yaml") -> Config:
         print(f"Please create a config.yaml file. See config.example.yaml for reference.", file=sys.stderr)
         sys.exit(1)
 
+    # Skip YAML parsing when the file is unchanged since the last load
+    file_stat = config_file.stat()
+    cached = _load_cached_config(config_file, file_stat)
+    if cached is not None:
+        return cached
+
     try:
         with open(config_file, 'r') as f:
-            config_dict = yaml.safe_load(f)
+            config_dict = yaml.load(f, Loader=YamlLoader)
 
         if not config_dict:
             raise ValueError("Configuration file is empty")
 
-        return Config(**config_dict)
+        config = Config(**config_dict)
+        _store_cached_config(config_file, file_stat, config)
+        return config
 
     except yaml.YAMLError as e:
         print(f"Error parsing YAML configuration: {e}", file=sys.stderr)
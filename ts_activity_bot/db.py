@@ -9,100 +9,358 @@ Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 """
 
 import logging
+import queue
 import sqlite3
+import threading
 import time
 from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sized, Tuple
 
 from ts_activity_bot.db_base import DatabaseBackend
 
 logger = logging.getLogger(__name__)
 
 
-SCHEMA_VERSION = 3
-
-SCHEMA_SQL = """
--- Main snapshots table (one row per poll)
-CREATE TABLE IF NOT EXISTS snapshots (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp INTEGER NOT NULL,
-    total_clients INTEGER NOT NULL,
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE INDEX IF NOT EXISTS idx_snapshots_timestamp ON snapshots(timestamp);
-
--- Client presence in each snapshot
-CREATE TABLE IF NOT EXISTS client_snapshots (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    snapshot_id INTEGER NOT NULL,
-    client_uid TEXT NOT NULL,
-    client_database_id INTEGER,
-    nickname TEXT NOT NULL,
-    channel_id INTEGER NOT NULL,
-    idle_ms INTEGER,
-    -- Away status tracking
-    is_away INTEGER DEFAULT 0,
-    away_message TEXT,
-    -- Voice/mute status tracking
-    is_talking INTEGER DEFAULT 0,
-    input_muted INTEGER DEFAULT 0,
-    output_muted INTEGER DEFAULT 0,
-    is_recording INTEGER DEFAULT 0,
-    -- Server groups (comma-separated IDs)
-    server_groups TEXT,
-    -- Connection info
-    connected_time INTEGER,
-    FOREIGN KEY (snapshot_id) REFERENCES snapshots(id) ON DELETE CASCADE
-);
-
-CREATE INDEX IF NOT EXISTS idx_client_uid_snapshot ON client_snapshots(client_uid, snapshot_id);
-CREATE INDEX IF NOT EXISTS idx_snapshot_id ON client_snapshots(snapshot_id);
-CREATE INDEX IF NOT EXISTS idx_client_uid ON client_snapshots(client_uid);
-CREATE INDEX IF NOT EXISTS idx_channel_id ON client_snapshots(channel_id);
-
--- Channel metadata cache
-CREATE TABLE IF NOT EXISTS channels (
-    channel_id INTEGER PRIMARY KEY,
-    channel_name TEXT NOT NULL,
-    parent_channel_id INTEGER,
-    channel_order INTEGER,
-    total_clients INTEGER DEFAULT 0,
-    last_updated INTEGER NOT NULL
-);
-
-CREATE INDEX IF NOT EXISTS idx_channels_parent ON channels(parent_channel_id);
-
--- User daily aggregates for faster queries
-CREATE TABLE IF NOT EXISTS user_aggregates (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    client_uid TEXT NOT NULL,
-    date TEXT NOT NULL, -- YYYY-MM-DD format
-    nickname TEXT NOT NULL,
-    total_samples INTEGER NOT NULL,
-    online_seconds INTEGER NOT NULL,
-    avg_idle_ms INTEGER,
-    most_visited_channel_id INTEGER,
-    is_away_count INTEGER DEFAULT 0,
-    is_talking_count INTEGER DEFAULT 0,
-    input_muted_count INTEGER DEFAULT 0,
-    output_muted_count INTEGER DEFAULT 0,
-    is_recording_count INTEGER DEFAULT 0,
-    UNIQUE(client_uid, date)
-);
-
-CREATE INDEX IF NOT EXISTS idx_user_aggregates_uid ON user_aggregates(client_uid);
-CREATE INDEX IF NOT EXISTS idx_user_aggregates_date ON user_aggregates(date);
-CREATE INDEX IF NOT EXISTS idx_user_aggregates_uid_date ON user_aggregates(client_uid, date);
-
--- Metadata table for versioning and settings
-CREATE TABLE IF NOT EXISTS metadata (
-    key TEXT PRIMARY KEY,
-    value TEXT
-);
+SCHEMA_VERSION = 8
+
+# Connection-level tuning for the long-lived writer connection
+CONNECTION_PRAGMAS = (
+    # Only takes effect on a new, empty file, so it must precede journal_mode
+    # (switching to WAL writes the header and fixes the page size)
+    "PRAGMA page_size=8192",
+    "PRAGMA journal_mode=WAL",      # Readers don't block the poller's writes
+    "PRAGMA synchronous=NORMAL",    # Safe with WAL; fsync per checkpoint, not per commit
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=1073741824",  # 1 GB (SQLite caps it at its compile-time maximum)
+    "PRAGMA cache_size=-65536",     # 64 MB
+    "PRAGMA foreign_keys=ON",       # Off by default; needed for ON DELETE CASCADE
+    "PRAGMA secure_delete=OFF",     # Don't zero freed pages when purging old data
+    "PRAGMA analysis_limit=400",    # Bound ANALYZE / PRAGMA optimize cost on large tables
+)
+
+# Tuning for the read-only connection (journal settings belong to the writer)
+READ_CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=1073741824",  # 1 GB (SQLite caps it at its compile-time maximum)
+    "PRAGMA cache_size=-16384",     # 16 MB
+)
+
+# Maximum read-only connections per Database; under WAL they read
+# concurrently with each other and with the writer
+READ_POOL_SIZE = 4
+
+# Snapshots deleted per cleanup transaction; keeps the WAL and the write
+# lock hold time bounded when a long backlog expires at once
+CLEANUP_BATCH_SIZE = 500
+
+
+CLIENT_SNAPSHOT_COLUMNS = (
+    "snapshot_id, client_uid, client_database_id, nickname, channel_id, idle_ms, "
+    "is_away, away_message, is_talking, input_muted, output_muted, is_recording, "
+    "server_groups, connected_time"
+)
+CLIENT_SNAPSHOT_COLUMN_COUNT = 14
+
+# Compiled statements kept per connection (sqlite3 default: 128)
+STATEMENT_CACHE_SIZE = 512
+
+# SQLite's compile-time default for SQLITE_LIMIT_VARIABLE_NUMBER before 3.32
+DEFAULT_MAX_VARIABLES = 999
+
+# DDL per table: the CREATE TABLE statement first, then its indexes and
+# triggers. Both schema creation and migrations build from this, so an
+# upgraded database ends up with exactly the indexes of a new one.
+TABLES: Dict[str, Tuple[str, ...]] = {
+    # Main snapshots table (one row per poll)
+    'snapshots': (
+        """
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            total_clients INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_snapshots_timestamp ON snapshots(timestamp)",
+    ),
+    # Client presence in each snapshot (plain rowid key: ids are never
+    # referenced, so AUTOINCREMENT's sqlite_sequence upkeep is not needed)
+    'client_snapshots': (
+        """
+        CREATE TABLE IF NOT EXISTS client_snapshots (
+            id INTEGER PRIMARY KEY,
+            snapshot_id INTEGER NOT NULL,
+            client_uid TEXT NOT NULL,
+            client_database_id INTEGER,
+            nickname TEXT NOT NULL,
+            channel_id INTEGER NOT NULL,
+            idle_ms INTEGER,
+            -- Away status tracking
+            is_away INTEGER DEFAULT 0,
+            away_message TEXT,
+            -- Voice/mute status tracking
+            is_talking INTEGER DEFAULT 0,
+            input_muted INTEGER DEFAULT 0,
+            output_muted INTEGER DEFAULT 0,
+            is_recording INTEGER DEFAULT 0,
+            -- Server groups (comma-separated IDs)
+            server_groups TEXT,
+            -- Connection info
+            connected_time INTEGER,
+            FOREIGN KEY (snapshot_id) REFERENCES snapshots(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_client_uid_snapshot ON client_snapshots(client_uid, snapshot_id)",
+        # Covering index for per-snapshot scans and daily aggregation (also serves snapshot_id lookups)
+        """
+        CREATE INDEX IF NOT EXISTS idx_cs_snap_cover ON client_snapshots(
+            snapshot_id, client_uid, channel_id, idle_ms,
+            is_away, is_talking, input_muted, output_muted, is_recording, nickname
+        )
+        """,
+    ),
+    # Channel metadata cache
+    'channels': (
+        """
+        CREATE TABLE IF NOT EXISTS channels (
+            channel_id INTEGER PRIMARY KEY,
+            channel_name TEXT NOT NULL,
+            parent_channel_id INTEGER,
+            channel_order INTEGER,
+            total_clients INTEGER DEFAULT 0,
+            last_updated INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_channels_parent ON channels(parent_channel_id)",
+    ),
+    # User daily aggregates for faster queries
+    'user_aggregates': (
+        """
+        CREATE TABLE IF NOT EXISTS user_aggregates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_uid TEXT NOT NULL,
+            date TEXT NOT NULL, -- YYYY-MM-DD format
+            nickname TEXT NOT NULL,
+            total_samples INTEGER NOT NULL,
+            online_seconds INTEGER NOT NULL,
+            avg_idle_ms INTEGER,
+            most_visited_channel_id INTEGER,
+            is_away_count INTEGER DEFAULT 0,
+            is_talking_count INTEGER DEFAULT 0,
+            input_muted_count INTEGER DEFAULT 0,
+            output_muted_count INTEGER DEFAULT 0,
+            is_recording_count INTEGER DEFAULT 0,
+            UNIQUE(client_uid, date)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_user_aggregates_uid ON user_aggregates(client_uid)",
+        "CREATE INDEX IF NOT EXISTS idx_user_aggregates_date ON user_aggregates(date)",
+        "CREATE INDEX IF NOT EXISTS idx_user_aggregates_uid_date ON user_aggregates(client_uid, date)",
+    ),
+    # Metadata table for versioning and settings
+    'metadata': (
+        """
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """,
+    ),
+    # Row counters kept current by triggers, so db-stats needs no table scans.
+    # total_clients equals the number of client_snapshots rows of the snapshot
+    # (and ON DELETE CASCADE removes exactly those), so per-snapshot triggers
+    # track both tables without a trigger on every client row
+    'stats_cache': (
+        """
+        CREATE TABLE IF NOT EXISTS stats_cache (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT OR IGNORE INTO stats_cache (key, value) VALUES
+            ('snapshot_count', 0),
+            ('client_snapshot_count', 0)
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_snapshots_count_insert AFTER INSERT ON snapshots
+        BEGIN
+            UPDATE stats_cache SET value = value + 1 WHERE key = 'snapshot_count';
+            UPDATE stats_cache SET value = value + NEW.total_clients WHERE key = 'client_snapshot_count';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_snapshots_count_delete AFTER DELETE ON snapshots
+        BEGIN
+            UPDATE stats_cache SET value = value - 1 WHERE key = 'snapshot_count';
+            UPDATE stats_cache SET value = value - OLD.total_clients WHERE key = 'client_snapshot_count';
+        END
+        """,
+    ),
+    # Distinct client UIDs present in client_snapshots
+    'known_clients': (
+        """
+        CREATE TABLE IF NOT EXISTS known_clients (
+            client_uid TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+        """,
+    ),
+}
+
+# Statements are module constants so the connection's statement cache
+# (keyed by SQL text) reuses their compiled form across calls
+INSERT_SNAPSHOT_SQL = "INSERT INTO snapshots (timestamp, total_clients) VALUES (?, ?)"
+DELETE_OLD_SNAPSHOTS_SQL = """
+DELETE FROM snapshots WHERE id IN (
+    SELECT id FROM snapshots WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+)
+"""
+DATABASE_STATS_SQL = """
+SELECT
+    (SELECT value FROM stats_cache WHERE key = 'snapshot_count'),
+    (SELECT value FROM stats_cache WHERE key = 'client_snapshot_count'),
+    (SELECT MIN(timestamp) FROM snapshots),
+    (SELECT MAX(timestamp) FROM snapshots),
+    (SELECT COUNT(*) FROM known_clients),
+    (SELECT CAST(user_version AS TEXT) FROM pragma_user_version),
+    (SELECT page_count * page_size FROM pragma_page_count, pragma_page_size)
+"""
+
+ADD_KNOWN_CLIENTS_SQL = """
+INSERT OR IGNORE INTO known_clients (client_uid)
+SELECT client_uid FROM client_snapshots WHERE snapshot_id = ?
+"""
+
+PRUNE_KNOWN_CLIENTS_SQL = """
+DELETE FROM known_clients
+WHERE NOT EXISTS (
+    SELECT 1 FROM client_snapshots cs WHERE cs.client_uid = known_clients.client_uid
+)
+"""
+
+LAST_SNAPSHOT_SQL = "SELECT MAX(timestamp) FROM snapshots"
+TABLE_EXISTS_SQL = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+GET_METADATA_SQL = "SELECT value FROM metadata WHERE key = ?"
+SET_METADATA_SQL = "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)"
+# Updates in place; INSERT OR REPLACE would delete and re-insert the row
+UPSERT_CHANNEL_SQL = """
+INSERT INTO channels
+(channel_id, channel_name, parent_channel_id, channel_order, total_clients, last_updated)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (channel_id) DO UPDATE SET
+    channel_name = excluded.channel_name,
+    parent_channel_id = excluded.parent_channel_id,
+    channel_order = excluded.channel_order,
+    total_clients = excluded.total_clients,
+    last_updated = excluded.last_updated
 """
 
+GET_CHANNEL_NAME_SQL = "SELECT channel_name FROM channels WHERE channel_id = ?"
+GET_ALL_CHANNELS_SQL = """
+SELECT channel_id, channel_name, parent_channel_id, channel_order, total_clients, last_updated
+FROM channels
+ORDER BY channel_order
+"""
+
+UPDATE_USER_AGGREGATES_SQL = """
+INSERT OR REPLACE INTO user_aggregates
+(client_uid, date, nickname, total_samples, online_seconds, avg_idle_ms,
+ most_visited_channel_id, is_away_count, is_talking_count, input_muted_count,
+ output_muted_count, is_recording_count)
+WITH channel_totals AS (
+    SELECT
+        cs.client_uid,
+        cs.channel_id,
+        COUNT(*) as samples,
+        MAX(cs.nickname) as nickname,
+        SUM(cs.idle_ms) as idle_sum,
+        COUNT(cs.idle_ms) as idle_samples,
+        SUM(cs.is_away) as is_away_count,
+        SUM(cs.is_talking) as is_talking_count,
+        SUM(cs.input_muted) as input_muted_count,
+        SUM(cs.output_muted) as output_muted_count,
+        SUM(cs.is_recording) as is_recording_count,
+        ROW_NUMBER() OVER (
+            PARTITION BY cs.client_uid ORDER BY COUNT(*) DESC, cs.channel_id
+        ) as channel_rank
+    FROM client_snapshots cs
+    JOIN snapshots s ON cs.snapshot_id = s.id
+    WHERE s.timestamp BETWEEN ? AND ?
+    GROUP BY cs.client_uid, cs.channel_id
+)
+SELECT
+    client_uid,
+    ? as date,
+    MAX(nickname) as nickname,
+    SUM(samples) as total_samples,
+    SUM(samples) * ? as online_seconds,
+    SUM(idle_sum) * 1.0 / NULLIF(SUM(idle_samples), 0) as avg_idle_ms,
+    MAX(CASE WHEN channel_rank = 1 THEN channel_id END) as most_visited_channel_id,
+    SUM(is_away_count) as is_away_count,
+    SUM(is_talking_count) as is_talking_count,
+    SUM(input_muted_count) as input_muted_count,
+    SUM(output_muted_count) as output_muted_count,
+    SUM(is_recording_count) as is_recording_count
+FROM channel_totals
+GROUP BY client_uid
+"""
+
+
+def _client_params(snapshot_id: int, clients: Iterable[Dict[str, any]]) -> list:
+    """
+    Flatten client dictionaries into bound parameters for a multi-row INSERT.
+
+    Values are appended straight into one flat list (no per-row tuple), and
+    each client's dict.get is looked up once instead of once per field.
+
+    Args:
+        snapshot_id: Snapshot the rows belong to
+        clients: Client dictionaries from TeamSpeak
+
+    Returns:
+        list: CLIENT_SNAPSHOT_COLUMN_COUNT values per client, in column order
+    """
+    params = []
+    extend = params.extend
+    for client in clients:
+        get = client.get
+        extend((
+            snapshot_id,
+            get('client_unique_identifier', 'unknown'),
+            get('client_database_id'),
+            get('client_nickname', 'Unknown'),
+            get('cid', 0),
+            get('client_idle_time'),
+            # Away status (comparisons bind as 0/1)
+            get('client_away', 0) == 1,
+            get('client_away_message', ''),
+            # Voice/mute status
+            get('client_is_talker', 0) == 1,
+            get('client_input_muted', 0) == 1,
+            get('client_output_muted', 0) == 1,
+            get('client_is_recording', 0) == 1,
+            # Server groups (comma-separated)
+            get('client_servergroups', ''),
+            # Connection time
+            get('connection_connected_time')
+        ))
+    return params
+
+
+def _create_table(cursor: sqlite3.Cursor, table: str) -> None:
+    """
+    Create a table and its indexes and triggers if they do not exist.
+
+    Args:
+        cursor: Database cursor
+        table: Key in TABLES
+    """
+    for statement in TABLES[table]:
+        cursor.execute(statement)
+
 
 class Database(DatabaseBackend):
     """SQLite database manager for TS6 activity tracking."""
@@ -115,18 +373,82 @@ class Database(DatabaseBackend):
             db_path: Path to SQLite database file
         """
         self.db_path = db_path
+        self._db_file = Path(db_path)
         self._ensure_directory()
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+        self._rows_per_insert = self._get_max_variables() // CLIENT_SNAPSHOT_COLUMN_COUNT
         self._init_schema()
+        # Read-only connections are opened on demand, after the schema exists
+        self._idle_readers: queue.LifoQueue = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(READ_POOL_SIZE)
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
 
     def _ensure_directory(self) -> None:
         """Ensure database directory exists."""
-        db_file = Path(self.db_path)
-        db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._db_file.parent.mkdir(parents=True, exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open the long-lived database connection.
+
+        Transactions are managed explicitly by get_connection()
+        (isolation_level=None), so the connection can be reused across calls.
+
+        Returns:
+            sqlite3.Connection: Tuned database connection
+        """
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=30.0,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        # Plain tuple rows: the writer only reads back ids and single values
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _connect_read_only(self) -> sqlite3.Connection:
+        """
+        Open a long-lived read-only connection for the reader pool.
+
+        Reads never take the write lock, so they are not serialized behind
+        an in-progress snapshot insert or cleanup.
+
+        Returns:
+            sqlite3.Connection: Read-only database connection
+        """
+        conn = sqlite3.connect(
+            f"{self._db_file.resolve().as_uri()}?mode=ro",
+            uri=True,
+            timeout=30.0,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in READ_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _get_max_variables(self) -> int:
+        """Get the maximum number of bound parameters per statement."""
+        try:
+            return self._conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        except (AttributeError, sqlite3.Error):
+            return DEFAULT_MAX_VARIABLES
 
     @contextmanager
     def get_connection(self):
         """
-        Context manager for database connections.
+        Context manager for a database transaction.
+
+        Reuses the instance's connection and wraps the block in
+        BEGIN IMMEDIATE/COMMIT (ROLLBACK on error). Nested use joins the
+        already open transaction.
 
         Yields:
             sqlite3.Connection: Database connection
@@ -136,16 +458,84 @@ class Database(DatabaseBackend):
                 cursor = conn.cursor()
                 cursor.execute("SELECT * FROM snapshots")
         """
-        conn = sqlite3.connect(self.db_path, timeout=30.0)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        with self._lock:
+            conn = self._conn
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            # executescript() commits on its own, so the transaction may be gone
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+
+    def run_maintenance(self) -> None:
+        """
+        Run periodic upkeep on the database.
+
+        PRAGMA optimize refreshes query planner statistics where they have
+        gone stale, and a TRUNCATE checkpoint copies the WAL back into the
+        database and resets it, so the WAL does not keep growing between
+        auto-checkpoints.
+        """
+        with self._lock:
+            # Checkpoints cannot run inside a transaction, so use autocommit
+            self._conn.execute("PRAGMA optimize")
+            busy, wal_pages, checkpointed = self._conn.execute(
+                "PRAGMA wal_checkpoint(TRUNCATE)"
+            ).fetchone()
+
+        if busy:
+            logger.debug("WAL checkpoint incomplete, readers still active")
+        else:
+            logger.debug(f"WAL checkpoint done ({checkpointed}/{wal_pages} pages)")
+
+    @contextmanager
+    def get_read_connection(self):
+        """
+        Context manager for a pooled read-only connection.
+
+        Up to READ_POOL_SIZE callers read at the same time, each on its own
+        connection; further callers wait for one to be returned. Connections
+        run in autocommit mode, so each statement sees the latest committed
+        data. Use get_connection() for anything that writes.
+
+        Yields:
+            sqlite3.Connection: Read-only database connection
+        """
+        with self._reader_slots:
+            try:
+                conn = self._idle_readers.get_nowait()
+            except queue.Empty:
+                # Every existing reader is in use by another slot holder
+                conn = self._connect_read_only()
+                with self._readers_lock:
+                    self._readers.append(conn)
+
+            try:
+                yield conn
+            finally:
+                self._idle_readers.put(conn)
+
+    def close(self) -> None:
+        """Close the database connections."""
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        with self._lock:
+            # Persist planner statistics for the queries this connection ran
+            try:
+                self._conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.debug(f"PRAGMA optimize on close failed: {e}")
+            self._conn.close()
 
     def initialize_schema(self) -> None:
         """Initialize database schema and run migrations if needed."""
@@ -153,28 +543,46 @@ class Database(DatabaseBackend):
 
     def _init_schema(self) -> None:
         """Initialize database schema if not exists."""
+        # Read the version inside the write transaction: another process
+        # (e.g. a second gunicorn worker) may be migrating the same file
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # Create tables
-            cursor.executescript(SCHEMA_SQL)
-
-            # Check schema version
-            cursor.execute("SELECT value FROM metadata WHERE key = 'schema_version'")
-            row = cursor.fetchone()
-
-            if row is None:
-                # First time setup
-                cursor.execute(
-                    "INSERT INTO metadata (key, value) VALUES ('schema_version', ?)",
-                    (str(SCHEMA_VERSION),)
+            # The schema version lives in the file header (PRAGMA user_version)
+            stored_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            current_version = stored_version
+            if current_version == 0:
+                # New database, or one from before user_version was used,
+                # which recorded its version in the metadata table
+                row = None
+                if cursor.execute(TABLE_EXISTS_SQL, ('metadata',)).fetchone():
+                    row = cursor.execute(GET_METADATA_SQL, ('schema_version',)).fetchone()
+                current_version = int(row[0]) if row else SCHEMA_VERSION
+
+            if current_version > SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"Database schema version {current_version} is newer than supported "
+                    f"version {SCHEMA_VERSION}; upgrade ts_activity_bot to use this database"
                 )
-                logger.info(f"Database initialized with schema version {SCHEMA_VERSION}")
+
+            if current_version < SCHEMA_VERSION:
+                logger.info(f"Migrating database from version {current_version} to {SCHEMA_VERSION}")
+                self._migrate_schema(conn, current_version, SCHEMA_VERSION)
             else:
-                current_version = int(row[0])
-                if current_version < SCHEMA_VERSION:
-                    logger.info(f"Migrating database from version {current_version} to {SCHEMA_VERSION}")
-                    self._migrate_schema(conn, current_version, SCHEMA_VERSION)
+                logger.debug(f"Database schema up to date (version {SCHEMA_VERSION})")
+
+            # Migrations only change existing objects; anything missing,
+            # including indexes they dropped, is created here. Old
+            # schemas lack columns that current indexes use, so this
+            # has to run after migrating.
+            for table in TABLES:
+                _create_table(cursor, table)
+
+            if current_version < SCHEMA_VERSION:
+                # Rebuilt tables and indexes have no statistics yet
+                cursor.execute("ANALYZE")
+            if stored_version < SCHEMA_VERSION:
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
     def _migrate_schema(self, conn: sqlite3.Connection, from_version: int, to_version: int) -> None:
         """
@@ -200,66 +608,103 @@ class Database(DatabaseBackend):
             cursor.execute("ALTER TABLE client_snapshots ADD COLUMN is_recording INTEGER DEFAULT 0")
             cursor.execute("ALTER TABLE client_snapshots ADD COLUMN server_groups TEXT")
             cursor.execute("ALTER TABLE client_snapshots ADD COLUMN connected_time INTEGER")
-
-            # Add index for channel_id
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_channel_id ON client_snapshots(channel_id)")
-
-            # Update schema version
-            cursor.execute("UPDATE metadata SET value = '2' WHERE key = 'schema_version'")
             logger.info("Schema migration v1 -> v2 completed")
 
         # Migration from version 2 to 3: Add channels cache and user aggregates
         if from_version < 3:
             logger.info("Migrating schema v2 -> v3: Adding channels cache and user aggregates")
 
-            # Create channels table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS channels (
-                    channel_id INTEGER PRIMARY KEY,
-                    channel_name TEXT NOT NULL,
-                    parent_channel_id INTEGER,
-                    channel_order INTEGER,
-                    total_clients INTEGER DEFAULT 0,
-                    last_updated INTEGER NOT NULL
-                )
-            """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_channels_parent ON channels(parent_channel_id)")
-
-            # Create user_aggregates table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS user_aggregates (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    client_uid TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    nickname TEXT NOT NULL,
-                    total_samples INTEGER NOT NULL,
-                    online_seconds INTEGER NOT NULL,
-                    avg_idle_ms INTEGER,
-                    most_visited_channel_id INTEGER,
-                    is_away_count INTEGER DEFAULT 0,
-                    is_talking_count INTEGER DEFAULT 0,
-                    input_muted_count INTEGER DEFAULT 0,
-                    output_muted_count INTEGER DEFAULT 0,
-                    is_recording_count INTEGER DEFAULT 0,
-                    UNIQUE(client_uid, date)
-                )
+            _create_table(cursor, 'channels')
+            _create_table(cursor, 'user_aggregates')
+            logger.info("Schema migration v2 -> v3 completed")
+
+        # Migration from version 3 to 4: Replace redundant client_snapshots indexes
+        if from_version < 4:
+            logger.info("Migrating schema v3 -> v4: Adding covering index for snapshot scans")
+
+            # Both are prefixes of idx_client_uid_snapshot / idx_cs_snap_cover
+            cursor.execute("DROP INDEX IF EXISTS idx_client_uid")
+            cursor.execute("DROP INDEX IF EXISTS idx_snapshot_id")
+            logger.info("Schema migration v3 -> v4 completed")
+
+        # Migration from version 4 to 5: Cached row counters for db-stats
+        if from_version < 5:
+            logger.info("Migrating schema v4 -> v5: Backfilling stats cache and known clients")
+
+            # Create the tables and triggers, then seed them from existing data
+            _create_table(cursor, 'stats_cache')
+            _create_table(cursor, 'known_clients')
+            cursor.execute(
+                "UPDATE stats_cache SET value = (SELECT COUNT(*) FROM snapshots) "
+                "WHERE key = 'snapshot_count'"
+            )
+            # Only count rows whose snapshot still exists: older releases
+            # left orphans behind that the delete trigger never subtracts
+            cursor.execute(
+                "UPDATE stats_cache SET value = (SELECT COUNT(*) FROM client_snapshots "
+                "WHERE snapshot_id IN (SELECT id FROM snapshots)) "
+                "WHERE key = 'client_snapshot_count'"
+            )
+            cursor.execute(
+                "INSERT OR IGNORE INTO known_clients (client_uid) "
+                "SELECT DISTINCT client_uid FROM client_snapshots "
+                "WHERE snapshot_id IN (SELECT id FROM snapshots)"
+            )
+            logger.info("Schema migration v4 -> v5 completed")
+
+        # Migration from version 5 to 6: Drop AUTOINCREMENT from client_snapshots
+        if from_version < 6:
+            logger.info("Migrating schema v5 -> v6: Rebuilding client_snapshots without AUTOINCREMENT")
+
+            # Indexes go with the old table and are rebuilt after migrating,
+            # so the copy below does not have to maintain them row by row
+            cursor.execute("ALTER TABLE client_snapshots RENAME TO client_snapshots_old")
+            cursor.execute(TABLES['client_snapshots'][0])
+            # Explicit columns: databases migrated from v1 have a different column order.
+            # Older releases did not enforce foreign keys, so retention cleanup
+            # left rows of deleted snapshots behind; copying them would now fail.
+            cursor.execute(f"""
+                INSERT INTO client_snapshots (id, {CLIENT_SNAPSHOT_COLUMNS})
+                SELECT id, {CLIENT_SNAPSHOT_COLUMNS} FROM client_snapshots_old
+                WHERE snapshot_id IN (SELECT id FROM snapshots)
             """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_aggregates_uid ON user_aggregates(client_uid)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_aggregates_date ON user_aggregates(date)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_aggregates_uid_date ON user_aggregates(client_uid, date)")
+            cursor.execute("DROP TABLE client_snapshots_old")
 
-            # Update schema version
-            cursor.execute("UPDATE metadata SET value = '3' WHERE key = 'schema_version'")
-            logger.info("Schema migration v2 -> v3 completed")
+            # The v5 backfill counted those rows; resync with what was kept
+            cursor.execute(
+                "UPDATE stats_cache SET value = (SELECT COUNT(*) FROM client_snapshots) "
+                "WHERE key = 'client_snapshot_count'"
+            )
+            cursor.execute(PRUNE_KNOWN_CLIENTS_SQL)
+            logger.info("Schema migration v5 -> v6 completed")
+
+        # Migration from version 6 to 7: Drop unused channel index
+        if from_version < 7:
+            logger.info("Migrating schema v6 -> v7: Dropping idx_channel_id")
+
+            # No query filters client_snapshots by channel_id alone
+            cursor.execute("DROP INDEX IF EXISTS idx_channel_id")
+            logger.info("Schema migration v6 -> v7 completed")
+
+        # Migration from version 7 to 8: Widen the covering index for aggregation
+        if from_version < 8:
+            logger.info("Migrating schema v7 -> v8: Widening idx_cs_snap_cover")
+
+            # update_user_aggregates reads flags and nickname too; the wider
+            # definition is created from TABLES after migrating
+            cursor.execute("DROP INDEX IF EXISTS idx_cs_snap_cover")
+            logger.info("Schema migration v7 -> v8 completed")
 
         logger.info(f"Schema migration completed: {from_version} -> {to_version}")
 
-    def insert_snapshot(self, clients: List[Dict[str, any]]) -> int:
+    def insert_snapshot(self, clients: Iterable[Dict[str, any]], timestamp: Optional[int] = None) -> int:
         """
         Insert a new snapshot with client data.
 
         Args:
-            clients: List of client dictionaries from TeamSpeak
+            clients: Client dictionaries from TeamSpeak (any iterable,
+                consumed once)
+            timestamp: Snapshot time (Unix seconds), defaults to now
 
         Returns:
             int: Snapshot ID
@@ -275,57 +720,82 @@ class Database(DatabaseBackend):
                 }
             ])
         """
-        timestamp = int(time.time())
-        total_clients = len(clients)
+        if timestamp is None:
+            timestamp = int(time.time())
 
+        with self.get_connection() as conn:
+            return self._write_snapshot(conn.cursor(), timestamp, clients)
+
+    def insert_snapshots_bulk(self, batches: Iterable[Tuple[int, Iterable[Dict[str, any]]]]) -> List[int]:
+        """
+        Insert several snapshots in a single transaction.
+
+        One commit (and fsync) covers the whole batch instead of one per
+        snapshot, e.g. when flushing polls buffered during an outage.
+
+        Args:
+            batches: (timestamp, clients) pairs, in insertion order
+
+        Returns:
+            List[int]: Snapshot IDs in the same order as batches
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            snapshot_ids = [
+                self._write_snapshot(cursor, timestamp, clients)
+                for timestamp, clients in batches
+            ]
 
-            # Insert snapshot
+        logger.debug(f"Inserted {len(snapshot_ids)} snapshots in one transaction")
+        return snapshot_ids
+
+    def _write_snapshot(self, cursor: sqlite3.Cursor, timestamp: int,
+                        clients: Iterable[Dict[str, any]]) -> int:
+        """
+        Write one snapshot and its client rows inside the caller's transaction.
+
+        Args:
+            cursor: Cursor of an open write transaction
+            timestamp: Unix timestamp of the snapshot
+            clients: Client dictionaries from TeamSpeak
+
+        Returns:
+            int: Snapshot ID
+        """
+        # Only a one-shot iterator has to be materialised to be counted
+        if not isinstance(clients, Sized):
+            clients = list(clients)
+        total_clients = len(clients)
+
+        # Insert snapshot
+        cursor.execute(INSERT_SNAPSHOT_SQL, (timestamp, total_clients))
+        snapshot_id = cursor.lastrowid
+
+        # Client rows are built lazily and written as many rows per
+        # statement as the bound parameter limit allows, so only one
+        # chunk of parameters is held in memory at a time
+        remaining = iter(clients)
+        while params := _client_params(snapshot_id, islice(remaining, self._rows_per_insert)):
             cursor.execute(
-                "INSERT INTO snapshots (timestamp, total_clients) VALUES (?, ?)",
-                (timestamp, total_clients)
+                self._client_insert_sql(len(params) // CLIENT_SNAPSHOT_COLUMN_COUNT),
+                params
             )
-            snapshot_id = cursor.lastrowid
 
-            # Insert client snapshots
-            client_data = [
-                (
-                    snapshot_id,
-                    client.get('client_unique_identifier', 'unknown'),
-                    client.get('client_database_id'),
-                    client.get('client_nickname', 'Unknown'),
-                    client.get('cid', 0),
-                    client.get('client_idle_time'),
-                    # Away status
-                    1 if client.get('client_away', 0) == 1 else 0,
-                    client.get('client_away_message', ''),
-                    # Voice/mute status
-                    1 if client.get('client_is_talker', 0) == 1 else 0,
-                    1 if client.get('client_input_muted', 0) == 1 else 0,
-                    1 if client.get('client_output_muted', 0) == 1 else 0,
-                    1 if client.get('client_is_recording', 0) == 1 else 0,
-                    # Server groups (comma-separated)
-                    client.get('client_servergroups', ''),
-                    # Connection time
-                    client.get('connection_connected_time')
-                )
-                for client in clients
-            ]
+        if total_clients:
+            cursor.execute(ADD_KNOWN_CLIENTS_SQL, (snapshot_id,))
 
-            cursor.executemany(
-                """
-                INSERT INTO client_snapshots
-                (snapshot_id, client_uid, client_database_id, nickname, channel_id, idle_ms,
-                 is_away, away_message, is_talking, input_muted, output_muted, is_recording,
-                 server_groups, connected_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                client_data
-            )
+        logger.debug(f"Inserted snapshot {snapshot_id} with {total_clients} clients")
+        return snapshot_id
 
-            logger.debug(f"Inserted snapshot {snapshot_id} with {total_clients} clients")
-            return snapshot_id
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _client_insert_sql(row_count: int) -> str:
+        """Build a multi-row INSERT for client_snapshots."""
+        row = "(" + ", ".join(["?"] * CLIENT_SNAPSHOT_COLUMN_COUNT) + ")"
+        return (
+            f"INSERT INTO client_snapshots ({CLIENT_SNAPSHOT_COLUMNS}) VALUES "
+            + ", ".join([row] * row_count)
+        )
 
     def cleanup_old_data(self, retention_days: int) -> int:
         """
@@ -338,20 +808,28 @@ class Database(DatabaseBackend):
             int: Number of snapshots deleted
         """
         cutoff_timestamp = int(time.time()) - (retention_days * 86400)
+        count = 0
 
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        # Delete old snapshots (CASCADE will delete client_snapshots), one
+        # batch per transaction so the poller can write in between
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(DELETE_OLD_SNAPSHOTS_SQL, (cutoff_timestamp, CLEANUP_BATCH_SIZE))
+                # Snapshots only; cascaded client rows are not counted
+                deleted = cursor.rowcount
 
-            # Get count before deletion
-            cursor.execute("SELECT COUNT(*) FROM snapshots WHERE timestamp < ?", (cutoff_timestamp,))
-            count = cursor.fetchone()[0]
+            count += deleted
+            if deleted < CLEANUP_BATCH_SIZE:
+                break
 
-            if count > 0:
-                # Delete old snapshots (CASCADE will delete client_snapshots)
-                cursor.execute("DELETE FROM snapshots WHERE timestamp < ?", (cutoff_timestamp,))
-                logger.info(f"Cleaned up {count} snapshots older than {retention_days} days")
+        if count > 0:
+            with self.get_connection() as conn:
+                # Forget clients whose last rows were just purged
+                conn.execute(PRUNE_KNOWN_CLIENTS_SQL)
+            logger.info(f"Cleaned up {count} snapshots older than {retention_days} days")
 
-            return count
+        return count
 
     def get_database_stats(self) -> Dict[str, any]:
         """
@@ -360,45 +838,52 @@ class Database(DatabaseBackend):
         Returns:
             dict: Database stats including size, row counts, date range
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
 
-            # File size
-            db_size = Path(self.db_path).stat().st_size if Path(self.db_path).exists() else 0
-
-            # Row counts
-            cursor.execute("SELECT COUNT(*) FROM snapshots")
-            snapshot_count = cursor.fetchone()[0]
+            # Row counts, date range, unique clients, schema version and size
+            # (pages in use, including ones still in the WAL) in one round-trip
+            cursor.execute(DATABASE_STATS_SQL)
+            (snapshot_count, client_snapshot_count, first_snapshot, last_snapshot,
+             unique_clients, schema_version, db_size) = cursor.fetchone()
+            first_snapshot = first_snapshot or None
+            last_snapshot = last_snapshot or None
 
-            cursor.execute("SELECT COUNT(*) FROM client_snapshots")
-            client_snapshot_count = cursor.fetchone()[0]
+        # The WAL file is only reset by checkpoints; count its disk usage too
+        try:
+            db_size += Path(f"{self.db_path}-wal").stat().st_size
+        except OSError:
+            pass
+
+        return {
+            'db_size_bytes': db_size,
+            'db_size_mb': round(db_size / 1024 / 1024, 2),
+            'snapshot_count': snapshot_count,
+            'client_snapshot_count': client_snapshot_count,
+            'unique_clients': unique_clients,
+            'first_snapshot_timestamp': first_snapshot,
+            'last_snapshot_timestamp': last_snapshot,
+            'schema_version': schema_version
+        }
+
+    def get_last_snapshot_timestamp(self) -> Optional[int]:
+        """
+        Get the timestamp of the most recent snapshot.
 
-            # Date range
-            cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM snapshots")
-            row = cursor.fetchone()
-            first_snapshot = row[0] if row[0] else None
-            last_snapshot = row[1] if row[1] else None
-
-            # Unique clients
-            cursor.execute("SELECT COUNT(DISTINCT client_uid) FROM client_snapshots")
-            unique_clients = cursor.fetchone()[0]
-
-            return {
-                'db_size_bytes': db_size,
-                'db_size_mb': round(db_size / 1024 / 1024, 2),
-                'snapshot_count': snapshot_count,
-                'client_snapshot_count': client_snapshot_count,
-                'unique_clients': unique_clients,
-                'first_snapshot_timestamp': first_snapshot,
-                'last_snapshot_timestamp': last_snapshot,
-                'schema_version': self._get_metadata('schema_version')
-            }
+        Returns:
+            int: Unix timestamp or None if there are no snapshots
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            # Served from idx_snapshots_timestamp without scanning the table
+            cursor.execute(LAST_SNAPSHOT_SQL)
+            return cursor.fetchone()[0]
 
     def _get_metadata(self, key: str) -> Optional[str]:
         """Get metadata value by key."""
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT value FROM metadata WHERE key = ?", (key,))
+            cursor.execute(GET_METADATA_SQL, (key,))
             row = cursor.fetchone()
             return row[0] if row else None
 
@@ -406,10 +891,7 @@ class Database(DatabaseBackend):
         """Set metadata value."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
-                (key, value)
-            )
+            cursor.execute(SET_METADATA_SQL, (key, value))
 
     def upsert_channels(self, channels: List[Dict[str, any]]) -> int:
         """
@@ -449,14 +931,7 @@ class Database(DatabaseBackend):
                 for channel in channels
             ]
 
-            cursor.executemany(
-                """
-                INSERT OR REPLACE INTO channels
-                (channel_id, channel_name, parent_channel_id, channel_order, total_clients, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                channel_data
-            )
+            cursor.executemany(UPSERT_CHANNEL_SQL, channel_data)
 
             logger.debug(f"Updated {len(channels)} channels in cache")
             return len(channels)
@@ -471,9 +946,9 @@ class Database(DatabaseBackend):
         Returns:
             str: Channel name or None if not found
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT channel_name FROM channels WHERE channel_id = ?", (channel_id,))
+            cursor.execute(GET_CHANNEL_NAME_SQL, (channel_id,))
             row = cursor.fetchone()
             return row[0] if row else None
 
@@ -484,13 +959,9 @@ class Database(DatabaseBackend):
         Returns:
             list: List of channel dictionaries
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT channel_id, channel_name, parent_channel_id, channel_order, total_clients, last_updated
-                FROM channels
-                ORDER BY channel_order
-            """)
+            cursor.execute(GET_ALL_CHANNELS_SQL)
 
             channels = []
             for row in cursor.fetchall():
@@ -529,38 +1000,10 @@ class Database(DatabaseBackend):
             cursor = conn.cursor()
 
             # Aggregate data from client_snapshots
-            cursor.execute("""
-                INSERT OR REPLACE INTO user_aggregates
-                (client_uid, date, nickname, total_samples, online_seconds, avg_idle_ms,
-                 most_visited_channel_id, is_away_count, is_talking_count, input_muted_count,
-                 output_muted_count, is_recording_count)
-                SELECT
-                    cs.client_uid,
-                    ? as date,
-                    MAX(cs.nickname) as nickname,
-                    COUNT(*) as total_samples,
-                    COUNT(*) * ? as online_seconds,
-                    AVG(cs.idle_ms) as avg_idle_ms,
-                    (
-                        SELECT channel_id
-                        FROM client_snapshots cs2
-                        WHERE cs2.client_uid = cs.client_uid
-                          AND s2.timestamp BETWEEN ? AND ?
-                        GROUP BY channel_id
-                        ORDER BY COUNT(*) DESC
-                        LIMIT 1
-                    ) as most_visited_channel_id,
-                    SUM(cs.is_away) as is_away_count,
-                    SUM(cs.is_talking) as is_talking_count,
-                    SUM(cs.input_muted) as input_muted_count,
-                    SUM(cs.output_muted) as output_muted_count,
-                    SUM(cs.is_recording) as is_recording_count
-                FROM client_snapshots cs
-                JOIN snapshots s ON cs.snapshot_id = s.id
-                LEFT JOIN snapshots s2 ON s2.id = cs.snapshot_id
-                WHERE s.timestamp BETWEEN ? AND ?
-                GROUP BY cs.client_uid
-            """, (date, self._get_poll_interval(), start_time, end_time, start_time, end_time))
+            cursor.execute(
+                UPDATE_USER_AGGREGATES_SQL,
+                (start_time, end_time, date, self._get_poll_interval())
+            )
 
             count = cursor.rowcount
             logger.info(f"Updated {count} user aggregates for {date}")
@@ -9,7 +9,7 @@ Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 class DatabaseBackend(ABC):
@@ -42,18 +42,33 @@ class DatabaseBackend(ABC):
         pass
 
     @abstractmethod
-    def insert_snapshot(self, clients: List[Dict[str, any]]) -> int:
+    def insert_snapshot(self, clients: Iterable[Dict[str, any]], timestamp: Optional[int] = None) -> int:
         """
         Insert a new snapshot with client data.
 
         Args:
-            clients: List of client dictionaries from TeamSpeak
+            clients: Client dictionaries from TeamSpeak (any iterable,
+                consumed once)
+            timestamp: Snapshot time (Unix seconds), defaults to now
 
         Returns:
             int: Snapshot ID
         """
         pass
 
+    @abstractmethod
+    def insert_snapshots_bulk(self, batches: Iterable[Tuple[int, Iterable[Dict[str, any]]]]) -> List[int]:
+        """
+        Insert several snapshots in a single transaction.
+
+        Args:
+            batches: (timestamp, clients) pairs, in insertion order
+
+        Returns:
+            List[int]: Snapshot IDs in the same order as batches
+        """
+        pass
+
     @abstractmethod
     def cleanup_old_data(self, retention_days: int) -> int:
         """
@@ -77,6 +92,18 @@ class DatabaseBackend(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_last_snapshot_timestamp(self) -> Optional[int]:
+        """
+        Get the timestamp of the most recent snapshot.
+
+        Cheap alternative to get_database_stats() for health checks.
+
+        Returns:
+            int: Unix timestamp or None if there are no snapshots
+        """
+        pass
+
     @abstractmethod
     def _get_metadata(self, key: str) -> Optional[str]:
         """
@@ -160,6 +187,10 @@ class DatabaseBackend(ABC):
         """
         pass
 
+    def run_maintenance(self) -> None:
+        """Refresh planner statistics and compact logs (optional)."""
+        pass
+
     def close(self) -> None:
         """Close database connections and cleanup resources (optional)."""
         pass
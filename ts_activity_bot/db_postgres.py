@@ -7,11 +7,12 @@ Copyright (C) 2025 Metroseksuaali
 Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 """
 
+import io
 import logging
 import time
 from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import psycopg2
 import psycopg2.extras
@@ -22,7 +23,32 @@ from ts_activity_bot.db_base import DatabaseBackend
 
 logger = logging.getLogger(__name__)
 
-SCHEMA_VERSION = 3
+SCHEMA_VERSION = 6
+
+CLIENT_SNAPSHOT_COLUMNS = (
+    "snapshot_id, client_uid, nickname, channel_id, idle_ms, is_away, "
+    "away_message, is_talking, input_muted, output_muted, is_recording, "
+    "server_groups, connected_time, client_database_id"
+)
+
+# Client rows are streamed with COPY, which does not parse or plan per row
+COPY_CLIENT_SNAPSHOTS_SQL = f"COPY client_snapshots ({CLIENT_SNAPSHOT_COLUMNS}) FROM STDIN WITH (FORMAT text)"
+
+# Below this many clients a plain INSERT is cheaper than setting up COPY
+COPY_MIN_ROWS = 20
+
+# Snapshots deleted per cleanup transaction; keeps lock hold time and WAL
+# volume bounded when a long backlog expires at once
+CLEANUP_BATCH_SIZE = 500
+
+DELETE_OLD_SNAPSHOTS_SQL = """
+DELETE FROM snapshots WHERE id IN (
+    SELECT id FROM snapshots WHERE timestamp < %s ORDER BY timestamp LIMIT %s
+)
+"""
+
+# Backslash escapes of the COPY text format
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
 
 # PostgreSQL schema (using BIGINT for timestamps, BIGSERIAL for auto-increment)
 SCHEMA_SQL = """
@@ -56,9 +82,9 @@ CREATE TABLE IF NOT EXISTS client_snapshots (
 );
 
 CREATE INDEX IF NOT EXISTS idx_client_uid_snapshot ON client_snapshots(client_uid, snapshot_id);
-CREATE INDEX IF NOT EXISTS idx_snapshot_id ON client_snapshots(snapshot_id);
-CREATE INDEX IF NOT EXISTS idx_client_uid ON client_snapshots(client_uid);
-CREATE INDEX IF NOT EXISTS idx_channel_id ON client_snapshots(channel_id);
+-- Covering index for per-snapshot scans and daily aggregation (also serves snapshot_id lookups)
+CREATE INDEX IF NOT EXISTS idx_cs_snap_cover ON client_snapshots(snapshot_id, client_uid, channel_id, idle_ms)
+    INCLUDE (is_away, is_talking, input_muted, output_muted, is_recording, nickname);
 
 -- Channel metadata cache
 CREATE TABLE IF NOT EXISTS channels (
@@ -102,6 +128,64 @@ CREATE TABLE IF NOT EXISTS metadata (
 """
 
 
+def _copy_rows(rows: List[tuple]) -> io.StringIO:
+    """
+    Encode rows as COPY ... FROM STDIN (FORMAT text) input.
+
+    Args:
+        rows: Row tuples in COPY column order
+
+    Returns:
+        io.StringIO: Tab-separated lines, NULL as \\N, ready to read
+    """
+    buf = io.StringIO()
+    write = buf.write
+    for row in rows:
+        write('\t'.join(
+            '\\N' if value is None else str(value).translate(_COPY_ESCAPES)
+            for value in row
+        ))
+        write('\n')
+    buf.seek(0)
+    return buf
+
+
+def _client_rows(snapshot_id: int, clients: List[Dict[str, any]]) -> List[tuple]:
+    """
+    Build client_snapshots rows in CLIENT_SNAPSHOT_COLUMNS order.
+
+    Each client's dict.get is looked up once instead of once per field.
+
+    Args:
+        snapshot_id: Parent snapshot ID
+        clients: Client dictionaries from TeamSpeak
+
+    Returns:
+        list: Row tuples
+    """
+    rows = []
+    append = rows.append
+    for client in clients:
+        get = client.get
+        append((
+            snapshot_id,
+            get('client_unique_identifier'),
+            get('client_nickname', 'Unknown'),
+            get('cid', 0),
+            get('client_idle_time'),
+            int(get('client_away', 0)),
+            get('client_away_message', ''),
+            int(get('client_is_talker', 0)),
+            int(get('client_input_muted', 0)),
+            int(get('client_output_muted', 0)),
+            int(get('client_is_recording', 0)),
+            get('client_servergroups', ''),
+            get('connection_connected_time'),
+            get('client_database_id')
+        ))
+    return rows
+
+
 class PostgreSQLBackend(DatabaseBackend):
     """PostgreSQL database backend implementation."""
 
@@ -150,14 +234,23 @@ class PostgreSQLBackend(DatabaseBackend):
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
+            # Check current schema version (0 = new database)
+            current_version = 0
+            cursor.execute("SELECT to_regclass('metadata') IS NOT NULL AS present")
+            if cursor.fetchone()['present']:
+                cursor.execute("SELECT value FROM metadata WHERE key = 'schema_version'")
+                row = cursor.fetchone()
+                current_version = int(row['value']) if row else 0
+
+            # Migrations only drop or change existing objects and run before
+            # SCHEMA_SQL, which then creates whatever is missing - each
+            # index is built once, in its current definition
+            if 0 < current_version < SCHEMA_VERSION:
+                self._migrate_schema(cursor, current_version, SCHEMA_VERSION)
+
             # Create tables
             cursor.execute(SCHEMA_SQL)
 
-            # Check current schema version
-            cursor.execute("SELECT value FROM metadata WHERE key = 'schema_version'")
-            row = cursor.fetchone()
-            current_version = int(row['value']) if row else 0
-
             if current_version == 0:
                 # First time initialization
                 cursor.execute(
@@ -166,8 +259,13 @@ class PostgreSQLBackend(DatabaseBackend):
                 )
                 logger.info(f"Database schema initialized (version {SCHEMA_VERSION})")
             elif current_version < SCHEMA_VERSION:
-                # Run migrations
-                self._migrate_schema(cursor, current_version, SCHEMA_VERSION)
+                # Rebuilt indexes have no statistics yet
+                cursor.execute("ANALYZE")
+                cursor.execute(
+                    "UPDATE metadata SET value = %s WHERE key = 'schema_version'",
+                    (str(SCHEMA_VERSION),)
+                )
+                logger.info(f"Schema migration completed: {current_version} -> {SCHEMA_VERSION}")
             else:
                 logger.debug(f"Database schema up to date (version {SCHEMA_VERSION})")
 
@@ -175,6 +273,9 @@ class PostgreSQLBackend(DatabaseBackend):
         """
         Run schema migrations.
 
+        Runs before SCHEMA_SQL, which recreates dropped indexes in their
+        current form.
+
         Args:
             cursor: Database cursor
             from_version: Current schema version
@@ -183,77 +284,83 @@ class PostgreSQLBackend(DatabaseBackend):
         logger.info(f"Migrating schema from v{from_version} to v{to_version}")
 
         # Migration logic here (similar to SQLite version)
-        # For now, just update version
-        cursor.execute(
-            "UPDATE metadata SET value = %s WHERE key = 'schema_version'",
-            (str(to_version),)
-        )
-        logger.info(f"Schema migration completed: {from_version} -> {to_version}")
+        if from_version < 4:
+            # Both are prefixes of idx_client_uid_snapshot / idx_cs_snap_cover
+            cursor.execute("DROP INDEX IF EXISTS idx_client_uid")
+            cursor.execute("DROP INDEX IF EXISTS idx_snapshot_id")
+
+        if from_version < 5:
+            # No query filters client_snapshots by channel_id alone
+            cursor.execute("DROP INDEX IF EXISTS idx_channel_id")
 
-    def insert_snapshot(self, clients: List[Dict[str, any]]) -> int:
+        if from_version < 6:
+            # update_user_aggregates reads flags and nickname too; SCHEMA_SQL
+            # recreates the index with them included
+            cursor.execute("DROP INDEX IF EXISTS idx_cs_snap_cover")
+
+    def insert_snapshot(self, clients: Iterable[Dict[str, any]], timestamp: Optional[int] = None) -> int:
         """Insert a new snapshot with client data."""
-        timestamp = int(time.time())
+        if timestamp is None:
+            timestamp = int(time.time())
+
+        with self.get_connection() as conn:
+            return self._write_snapshot(conn.cursor(), timestamp, clients)
 
+    def insert_snapshots_bulk(self, batches: Iterable[Tuple[int, Iterable[Dict[str, any]]]]) -> List[int]:
+        """Insert several snapshots in a single transaction."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            return [
+                self._write_snapshot(cursor, timestamp, clients)
+                for timestamp, clients in batches
+            ]
 
-            # Insert snapshot
-            cursor.execute(
-                "INSERT INTO snapshots (timestamp, total_clients) VALUES (%s, %s) RETURNING id",
-                (timestamp, len(clients))
-            )
-            snapshot_id = cursor.fetchone()['id']
-
-            # Insert client data
-            if clients:
-                client_data = [
-                    (
-                        snapshot_id,
-                        client.get('client_unique_identifier'),
-                        client.get('client_nickname', 'Unknown'),
-                        client.get('cid', 0),
-                        client.get('client_idle_time'),
-                        int(client.get('client_away', 0)),
-                        client.get('client_away_message', ''),
-                        int(client.get('client_is_talker', 0)),
-                        int(client.get('client_input_muted', 0)),
-                        int(client.get('client_output_muted', 0)),
-                        int(client.get('client_is_recording', 0)),
-                        client.get('client_servergroups', ''),
-                        client.get('connection_connected_time'),
-                        client.get('client_database_id')
-                    )
-                    for client in clients
-                ]
-
-                psycopg2.extras.execute_batch(
+    def _write_snapshot(self, cursor, timestamp: int, clients: Iterable[Dict[str, any]]) -> int:
+        """Write one snapshot and its client rows inside the caller's transaction."""
+        clients = list(clients)
+
+        # Insert snapshot
+        cursor.execute(
+            "INSERT INTO snapshots (timestamp, total_clients) VALUES (%s, %s) RETURNING id",
+            (timestamp, len(clients))
+        )
+        snapshot_id = cursor.fetchone()['id']
+
+        # Insert client data
+        if clients:
+            client_data = _client_rows(snapshot_id, clients)
+
+            if len(client_data) >= COPY_MIN_ROWS:
+                cursor.copy_expert(COPY_CLIENT_SNAPSHOTS_SQL, _copy_rows(client_data))
+            else:
+                psycopg2.extras.execute_values(
                     cursor,
-                    """
-                    INSERT INTO client_snapshots
-                    (snapshot_id, client_uid, nickname, channel_id, idle_ms, is_away,
-                     away_message, is_talking, input_muted, output_muted, is_recording,
-                     server_groups, connected_time, client_database_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
+                    f"INSERT INTO client_snapshots ({CLIENT_SNAPSHOT_COLUMNS}) VALUES %s",
                     client_data
                 )
 
-            logger.debug(f"Inserted snapshot {snapshot_id} with {len(clients)} clients")
-            return snapshot_id
+        logger.debug(f"Inserted snapshot {snapshot_id} with {len(clients)} clients")
+        return snapshot_id
 
     def cleanup_old_data(self, retention_days: int) -> int:
         """Delete snapshots older than retention period."""
         cutoff_time = int(time.time()) - (retention_days * 86400)
+        count = 0
 
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "DELETE FROM snapshots WHERE timestamp < %s",
-                (cutoff_time,)
-            )
-            deleted = cursor.rowcount
-            logger.info(f"Deleted {deleted} old snapshots (retention: {retention_days} days)")
-            return deleted
+        # One batch per transaction (CASCADE deletes client_snapshots), so
+        # the poller's inserts are not held up behind one huge DELETE
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(DELETE_OLD_SNAPSHOTS_SQL, (cutoff_time, CLEANUP_BATCH_SIZE))
+                deleted = cursor.rowcount
+
+            count += deleted
+            if deleted < CLEANUP_BATCH_SIZE:
+                break
+
+        logger.info(f"Deleted {count} old snapshots (retention: {retention_days} days)")
+        return count
 
     def get_database_stats(self) -> Dict[str, any]:
         """Get database statistics."""
@@ -289,6 +396,13 @@ class PostgreSQLBackend(DatabaseBackend):
                 'schema_version': schema_version
             }
 
+    def get_last_snapshot_timestamp(self) -> Optional[int]:
+        """Get the timestamp of the most recent snapshot."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(timestamp) as last_ts FROM snapshots")
+            return cursor.fetchone()['last_ts']
+
     def _get_metadata(self, key: str) -> Optional[str]:
         """Get metadata value."""
         with self.get_connection() as conn:
@@ -328,12 +442,13 @@ class PostgreSQLBackend(DatabaseBackend):
                 for channel in channels
             ]
 
-            psycopg2.extras.execute_batch(
+            # One multi-row INSERT per page instead of one statement per channel
+            psycopg2.extras.execute_values(
                 cursor,
                 """
                 INSERT INTO channels
                 (channel_id, channel_name, parent_channel_id, channel_order, total_clients, last_updated)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                VALUES %s
                 ON CONFLICT (channel_id) DO UPDATE SET
                     channel_name = EXCLUDED.channel_name,
                     parent_channel_id = EXCLUDED.parent_channel_id,
@@ -341,7 +456,8 @@ class PostgreSQLBackend(DatabaseBackend):
                     total_clients = EXCLUDED.total_clients,
                     last_updated = EXCLUDED.last_updated
                 """,
-                channel_data
+                channel_data,
+                page_size=500
             )
 
             logger.debug(f"Updated {len(channels)} channels in cache")
@@ -358,7 +474,8 @@ class PostgreSQLBackend(DatabaseBackend):
     def get_all_channels(self) -> List[Dict[str, any]]:
         """Get all channels from cache."""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
+            # Plain tuple cursor: rows are copied into dicts below anyway
+            cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
             cursor.execute("""
                 SELECT channel_id, channel_name, parent_channel_id, channel_order, total_clients, last_updated
                 FROM channels
@@ -367,12 +484,12 @@ class PostgreSQLBackend(DatabaseBackend):
 
             return [
                 {
-                    'channel_id': row['channel_id'],
-                    'channel_name': row['channel_name'],
-                    'parent_channel_id': row['parent_channel_id'],
-                    'channel_order': row['channel_order'],
-                    'total_clients': row['total_clients'],
-                    'last_updated': row['last_updated']
+                    'channel_id': row[0],
+                    'channel_name': row[1],
+                    'parent_channel_id': row[2],
+                    'channel_order': row[3],
+                    'total_clients': row[4],
+                    'last_updated': row[5]
                 }
                 for row in cursor.fetchall()
             ]
@@ -397,32 +514,42 @@ class PostgreSQLBackend(DatabaseBackend):
                 (client_uid, date, nickname, total_samples, online_seconds, avg_idle_ms,
                  most_visited_channel_id, is_away_count, is_talking_count, input_muted_count,
                  output_muted_count, is_recording_count)
+                WITH channel_totals AS (
+                    SELECT
+                        cs.client_uid,
+                        cs.channel_id,
+                        COUNT(*) as samples,
+                        MAX(cs.nickname) as nickname,
+                        SUM(cs.idle_ms) as idle_sum,
+                        COUNT(cs.idle_ms) as idle_samples,
+                        SUM(cs.is_away) as is_away_count,
+                        SUM(cs.is_talking) as is_talking_count,
+                        SUM(cs.input_muted) as input_muted_count,
+                        SUM(cs.output_muted) as output_muted_count,
+                        SUM(cs.is_recording) as is_recording_count,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY cs.client_uid ORDER BY COUNT(*) DESC, cs.channel_id
+                        ) as channel_rank
+                    FROM client_snapshots cs
+                    JOIN snapshots s ON cs.snapshot_id = s.id
+                    WHERE s.timestamp BETWEEN %s AND %s
+                    GROUP BY cs.client_uid, cs.channel_id
+                )
                 SELECT
-                    cs.client_uid,
+                    client_uid,
                     %s as date,
-                    MAX(cs.nickname) as nickname,
-                    COUNT(*) as total_samples,
-                    COUNT(*) * %s as online_seconds,
-                    AVG(cs.idle_ms) as avg_idle_ms,
-                    (
-                        SELECT channel_id
-                        FROM client_snapshots cs2
-                        JOIN snapshots s2 ON cs2.snapshot_id = s2.id
-                        WHERE cs2.client_uid = cs.client_uid
-                          AND s2.timestamp BETWEEN %s AND %s
-                        GROUP BY channel_id
-                        ORDER BY COUNT(*) DESC
-                        LIMIT 1
-                    ) as most_visited_channel_id,
-                    SUM(cs.is_away) as is_away_count,
-                    SUM(cs.is_talking) as is_talking_count,
-                    SUM(cs.input_muted) as input_muted_count,
-                    SUM(cs.output_muted) as output_muted_count,
-                    SUM(cs.is_recording) as is_recording_count
-                FROM client_snapshots cs
-                JOIN snapshots s ON cs.snapshot_id = s.id
-                WHERE s.timestamp BETWEEN %s AND %s
-                GROUP BY cs.client_uid
+                    MAX(nickname) as nickname,
+                    SUM(samples) as total_samples,
+                    SUM(samples) * %s as online_seconds,
+                    SUM(idle_sum) * 1.0 / NULLIF(SUM(idle_samples), 0) as avg_idle_ms,
+                    MAX(CASE WHEN channel_rank = 1 THEN channel_id END) as most_visited_channel_id,
+                    SUM(is_away_count) as is_away_count,
+                    SUM(is_talking_count) as is_talking_count,
+                    SUM(input_muted_count) as input_muted_count,
+                    SUM(output_muted_count) as output_muted_count,
+                    SUM(is_recording_count) as is_recording_count
+                FROM channel_totals
+                GROUP BY client_uid
                 ON CONFLICT (client_uid, date) DO UPDATE SET
                     nickname = EXCLUDED.nickname,
                     total_samples = EXCLUDED.total_samples,
@@ -434,7 +561,7 @@ class PostgreSQLBackend(DatabaseBackend):
                     input_muted_count = EXCLUDED.input_muted_count,
                     output_muted_count = EXCLUDED.output_muted_count,
                     is_recording_count = EXCLUDED.is_recording_count
-            """, (date, poll_interval, start_time, end_time, start_time, end_time))
+            """, (start_time, end_time, date, poll_interval))
 
             count = cursor.rowcount
             logger.info(f"Updated {count} user aggregates for {date}")
@@ -444,6 +571,27 @@ class PostgreSQLBackend(DatabaseBackend):
         """Set polling interval in metadata."""
         self.set_metadata('poll_interval', str(interval))
 
+    def run_maintenance(self) -> None:
+        """
+        Vacuum and analyze the snapshot tables.
+
+        Keeps the visibility map current so update_user_aggregates can read
+        idx_cs_snap_cover with index-only scans; before PostgreSQL 13,
+        autovacuum does not run on insert-only tables. VACUUM cannot run
+        inside a transaction, so the connection is switched to autocommit.
+        """
+        conn = self.pool.getconn()
+        try:
+            isolation_level = conn.isolation_level
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("VACUUM (ANALYZE) snapshots, client_snapshots")
+            finally:
+                conn.set_isolation_level(isolation_level)
+        finally:
+            self.pool.putconn(conn)
+
     def close(self) -> None:
         """Close all connections in the pool."""
         if self.pool:
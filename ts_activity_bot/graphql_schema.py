@@ -7,12 +7,13 @@ Copyright (C) 2025 Metroseksuaali
 Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 """
 
-from typing import List, Optional
+from typing import Any, Callable, List, Optional
 
 import logging
 import strawberry
 from strawberry.fastapi import GraphQLRouter
 
+from ts_activity_bot.cache import cached_stats, single_flight
 from ts_activity_bot.stats import StatsCalculator
 
 logger = logging.getLogger(__name__)
@@ -20,10 +21,21 @@ logger = logging.getLogger(__name__)
 stats_calc: Optional[StatsCalculator] = None
 
 
-def set_stats_calculator(calculator: Optional[StatsCalculator]) -> None:
-    """Allow FastAPI app to supply the shared stats calculator instance."""
-    global stats_calc
+def set_stats_calculator(calculator: Optional[StatsCalculator], cache_ttl: float = 0) -> None:
+    """
+    Allow FastAPI app to supply the shared stats calculator instance.
+
+    Args:
+        calculator: Stats calculator, or None when analytics are unavailable
+        cache_ttl: Seconds to reuse resolver results (0 disables caching)
+    """
+    global stats_calc, _stats_query
     stats_calc = calculator
+    if cache_ttl > 0:
+        # Keyed by method and arguments, like the REST endpoint caches
+        _stats_query = cached_stats(ttl=cache_ttl, maxsize=1024)(single_flight(_run_stats_query))
+    else:
+        _stats_query = _run_stats_query
 
 
 def _require_stats_calculator() -> StatsCalculator:
@@ -35,6 +47,15 @@ def _require_stats_calculator() -> StatsCalculator:
     return stats_calc
 
 
+def _run_stats_query(method: str, **kwargs: Any) -> Any:
+    """Call a StatsCalculator method by name."""
+    return getattr(_require_stats_calculator(), method)(**kwargs)
+
+
+# Replaced by a cached wrapper when set_stats_calculator() gets a TTL
+_stats_query: Callable[..., Any] = _run_stats_query
+
+
 # GraphQL Types
 
 @strawberry.type
@@ -190,8 +211,7 @@ class Query:
         limit: int = 10
     ) -> List[User]:
         """Get top users by online time"""
-        stats = _require_stats_calculator()
-        users = stats.get_top_users(days=days, limit=limit)
+        users = _stats_query('get_top_users', days=days, limit=limit)
         return [
             User(
                 client_uid=u['client_uid'],
@@ -210,8 +230,7 @@ class Query:
         days: Optional[int] = 30
     ) -> Optional[UserDetailed]:
         """Get detailed statistics for a specific user"""
-        stats = _require_stats_calculator()
-        user = stats.get_user_stats(client_uid, days=days)
+        user = _stats_query('get_user_stats', client_uid=client_uid, days=days)
         if not user:
             return None
 
@@ -237,8 +256,7 @@ class Query:
     @strawberry.field
     def channels(self, days: Optional[int] = 7) -> List[Channel]:
         """Get channel statistics"""
-        stats = _require_stats_calculator()
-        channels = stats.get_channel_stats(days=days)
+        channels = _stats_query('get_channel_stats', days=days)
         return [
             Channel(
                 channel_id=ch['channel_id'],
@@ -253,8 +271,7 @@ class Query:
     @strawberry.field
     def hourly_heatmap(self, days: Optional[int] = 7) -> List[HourlyData]:
         """Get hourly activity heatmap"""
-        stats = _require_stats_calculator()
-        data = stats.get_hourly_heatmap(days=days)
+        data = _stats_query('get_hourly_heatmap', days=days)
         return [
             HourlyData(
                 hour=h['hour'],
@@ -267,8 +284,7 @@ class Query:
     @strawberry.field
     def daily_activity(self, days: Optional[int] = 30) -> List[DailyData]:
         """Get daily activity by day of week"""
-        stats = _require_stats_calculator()
-        data = stats.get_daily_activity(days=days)
+        data = _stats_query('get_daily_activity', days=days)
         return [
             DailyData(
                 day_of_week=d['day_of_week'],
@@ -282,8 +298,7 @@ class Query:
     @strawberry.field
     def summary(self, days: Optional[int] = 7) -> Summary:
         """Get overall statistics summary"""
-        stats = _require_stats_calculator()
-        data = stats.get_summary(days=days)
+        data = _stats_query('get_summary', days=days)
         return Summary(
             period_days=data['period_days'],
             total_snapshots=data['total_snapshots'],
@@ -299,8 +314,7 @@ class Query:
         limit: int = 10
     ) -> List[PeakTime]:
         """Get peak activity times"""
-        stats = _require_stats_calculator()
-        peaks = stats.get_peak_times(days=days, limit=limit)
+        peaks = _stats_query('get_peak_times', days=days, limit=limit)
         return [
             PeakTime(
                 timestamp=p['timestamp'],
@@ -313,8 +327,7 @@ class Query:
     @strawberry.field
     def online_now(self) -> List[OnlineUser]:
         """Get currently online users"""
-        stats = _require_stats_calculator()
-        users = stats.get_online_now()
+        users = _stats_query('get_online_now')
         return [
             OnlineUser(
                 client_uid=u['client_uid'],
@@ -355,8 +368,7 @@ class Query:
         - Regular User (50-79 score)
         - Casual User (0-49 score)
         """
-        stats = _require_stats_calculator()
-        users = stats.get_user_lifetime_value(days=days, limit=limit)
+        users = _stats_query('get_user_lifetime_value', days=days, limit=limit)
         return [
             LTVUser(
                 client_uid=u['client_uid'],
@@ -381,8 +393,7 @@ class Query:
     @strawberry.field
     def ltv_summary(self, days: Optional[int] = None) -> LTVSummary:
         """Get User Lifetime Value distribution summary"""
-        stats = _require_stats_calculator()
-        data = stats.get_ltv_summary(days=days)
+        data = _stats_query('get_ltv_summary', days=days)
         return LTVSummary(
             period_days=data['period_days'],
             total_users=data['total_users'],
@@ -398,8 +409,7 @@ class Query:
     @strawberry.field
     def growth_metrics(self, days: int = 7) -> GrowthMetrics:
         """Get user growth metrics"""
-        stats = _require_stats_calculator()
-        data = stats.get_growth_metrics(days=days)
+        data = _stats_query('get_growth_metrics', days=days)
         return GrowthMetrics(
             period_days=data['period_days'],
             total_unique_users=data['total_unique_users'],
@@ -0,0 +1,22 @@
+"""
+Gunicorn worker class for the multi-process API server.
+
+Kept out of api.py so gunicorn can import it by path without re-importing
+the application module (which is __main__ under "python -m").
+
+Copyright (C) 2025 Metroseksuaali
+Licensed under GNU AGPL v3.0 - see LICENSE file for details.
+"""
+
+from uvicorn.workers import UvicornWorker
+
+
+class ApiWorker(UvicornWorker):
+    """
+    Uvicorn worker using the same loop/HTTP implementations as uvicorn.run().
+
+    The stock worker always uses "auto". api._run_gunicorn() fills in
+    CONFIG_KWARGS from _server_impls() before the workers are forked.
+    """
+
+    CONFIG_KWARGS = dict(UvicornWorker.CONFIG_KWARGS)
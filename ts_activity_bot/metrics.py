@@ -8,7 +8,7 @@ Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 """
 
 import logging
-from typing import Dict
+from typing import Dict, Optional
 
 from prometheus_client import Counter, Gauge, Histogram, Info, generate_latest, CONTENT_TYPE_LATEST
 
@@ -51,18 +51,21 @@ ts_database_size_bytes = Gauge('ts_database_size_bytes', 'Database file size in
 class MetricsCollector:
     """Collects and updates Prometheus metrics from TeamSpeak statistics."""
 
-    def __init__(self, config=None):
+    def __init__(self, config=None, stats_calc: Optional[StatsCalculator] = None):
         """
         Initialize metrics collector.
 
         Args:
             config: Bot configuration (if None, loads from get_config())
+            stats_calc: Shared stats calculator (if None, a new one is created)
         """
         if config is None:
             config = get_config()
 
         self.config = config
-        self.stats_calc = StatsCalculator(config.database.path, config.polling.interval_seconds)
+        if stats_calc is None:
+            stats_calc = StatsCalculator(config.database.path, config.polling.interval_seconds)
+        self.stats_calc = stats_calc
 
         # Set static info
         ts_info.info({
@@ -144,14 +147,18 @@ class MetricsCollector:
         return generate_latest()
 
 
-def create_metrics_collector(config=None) -> MetricsCollector:
+def create_metrics_collector(
+    config=None,
+    stats_calc: Optional[StatsCalculator] = None
+) -> MetricsCollector:
     """
     Factory function to create metrics collector.
 
     Args:
         config: Bot configuration (if None, loads from get_config())
+        stats_calc: Shared stats calculator (if None, a new one is created)
 
     Returns:
         MetricsCollector: Configured collector instance
     """
-    return MetricsCollector(config)
+    return MetricsCollector(config, stats_calc)
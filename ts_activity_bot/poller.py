@@ -14,6 +14,7 @@ import time
 from datetime import datetime, timedelta
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
+from typing import Optional
 
 from ts_activity_bot.config import get_config
 from ts_activity_bot.db import create_database
@@ -86,7 +87,7 @@ def exponential_backoff(attempt: int, base: int = 2) -> int:
     return base ** attempt
 
 
-def poll_once(client, db, logger) -> bool:
+def poll_once(client, db, logger, timestamp: Optional[int] = None) -> bool:
     """
     Execute one polling iteration.
 
@@ -94,6 +95,7 @@ def poll_once(client, db, logger) -> bool:
         client: TeamSpeak query client
         db: Database instance
         logger: Logger instance
+        timestamp: Snapshot time (Unix seconds), defaults to now
 
     Returns:
         bool: True if successful, False otherwise
@@ -103,7 +105,7 @@ def poll_once(client, db, logger) -> bool:
         clients = client.fetch_clientlist()
 
         # Insert snapshot into database
-        snapshot_id = db.insert_snapshot(clients)
+        snapshot_id = db.insert_snapshot(clients, timestamp)
 
         logger.info(f"Snapshot {snapshot_id}: {len(clients)} clients online")
         return True
@@ -147,6 +149,21 @@ def update_channel_cache(client, db, logger) -> None:
         logger.error(f"Channel cache update failed: {e}", exc_info=True)
 
 
+def run_maintenance(db, logger) -> None:
+    """
+    Run periodic database upkeep (statistics, WAL checkpoint).
+
+    Args:
+        db: Database instance
+        logger: Logger instance
+    """
+    try:
+        db.run_maintenance()
+        logger.debug("Database maintenance completed")
+    except Exception as e:
+        logger.error(f"Database maintenance failed: {e}", exc_info=True)
+
+
 def update_aggregates(db, logger) -> None:
     """
     Update user aggregates for yesterday's data.
@@ -220,9 +237,11 @@ def main():
     last_cleanup = datetime.now()
     last_channel_update = datetime.now()
     last_aggregate_update = datetime.now()
+    last_maintenance = datetime.now()
     cleanup_interval = timedelta(hours=24)  # Run cleanup daily
     channel_update_interval = timedelta(hours=1)  # Update channels hourly
     aggregate_update_interval = timedelta(hours=6)  # Update aggregates every 6 hours
+    maintenance_interval = timedelta(hours=1)  # Optimize and checkpoint hourly
 
     # Store poll interval in metadata for aggregation calculations
     db.set_poll_interval(config.polling.interval_seconds)
@@ -240,7 +259,7 @@ def main():
             poll_start = time.time()
 
             # Execute poll
-            success = poll_once(client, db, logger)
+            success = poll_once(client, db, logger, int(poll_start))
 
             if success:
                 consecutive_failures = 0
@@ -287,6 +306,11 @@ def main():
                 update_aggregates(db, logger)
                 last_aggregate_update = now
 
+            # Database maintenance
+            if now - last_maintenance >= maintenance_interval:
+                run_maintenance(db, logger)
+                last_maintenance = now
+
             # Sleep until next poll
             poll_duration = time.time() - poll_start
             sleep_time = max(0, config.polling.interval_seconds - poll_duration)
@@ -308,6 +332,12 @@ def main():
         except Exception as e:
             logger.error(f"Error closing client: {e}")
 
+        try:
+            db.close()
+            logger.info("Database closed")
+        except Exception as e:
+            logger.error(f"Error closing database: {e}")
+
         logger.info("Poller service stopped")
 
 
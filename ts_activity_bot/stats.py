@@ -9,11 +9,22 @@ Licensed under GNU AGPL v3.0 - see LICENSE file for details.
 
 import logging
 import sqlite3
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Read-side tuning applied to every analytics connection
+READ_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=1073741824", # 1 GB (SQLite caps it at its compile-time maximum)
+    "PRAGMA cache_size=-65536",    # 64 MB
+)
+
+# Compiled statements kept per connection (sqlite3 default: 128)
+STATEMENT_CACHE_SIZE = 512
+
 
 class StatsCalculator:
     """Calculate statistics from activity database."""
@@ -28,13 +39,44 @@ class StatsCalculator:
         """
         self.db_path = db_path
         self.poll_interval = poll_interval
+        self._local = threading.local()
 
     def _get_connection(self) -> sqlite3.Connection:
-        """Get database connection."""
-        conn = sqlite3.connect(self.db_path, timeout=30.0)
-        conn.row_factory = sqlite3.Row
+        """
+        Get this thread's database connection.
+
+        Connections are opened lazily, tuned once and then reused for every
+        query made from the same thread (API threadpool workers included).
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=30.0,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+            conn.row_factory = sqlite3.Row
+            for pragma in READ_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
         return conn
 
+    def warm_up(self) -> None:
+        """
+        Prepare the database for fast reads before the first request.
+
+        Switches the file to WAL so analytics reads don't block on (or block)
+        the poller's writes, then loads the schema and snapshot index pages
+        into cache.
+        """
+        conn = self._get_connection()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            # Read-only database (e.g. the API's :ro mount) - keep current mode
+            logger.debug(f"Could not enable WAL mode: {e}")
+        conn.execute("SELECT MAX(timestamp) FROM snapshots").fetchone()
+
     def _get_time_range(self, days: Optional[int] = None) -> Tuple[int, int]:
         """
         Get timestamp range for query.
@@ -61,48 +103,31 @@ class StatsCalculator:
             limit: Maximum number of users to return
 
         Returns:
-            list: Top users with stats
+            list: Top users (client_uid, nickname, online_hours, first_seen, last_seen)
         """
         start_time, end_time = self._get_time_range(days)
 
+        # Online time = sample_count * poll_interval
         query = """
         SELECT
             client_uid,
             nickname,
-            COUNT(*) as sample_count,
+            ROUND(COUNT(*) * ? / 3600.0, 2) as online_hours,
             MIN(s.timestamp) as first_seen,
             MAX(s.timestamp) as last_seen
         FROM client_snapshots cs
         JOIN snapshots s ON cs.snapshot_id = s.id
         WHERE s.timestamp BETWEEN ? AND ?
         GROUP BY client_uid
-        ORDER BY sample_count DESC
+        ORDER BY COUNT(*) DESC
         LIMIT ?
         """
 
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute(query, (start_time, end_time, limit))
+        cursor.execute(query, (self.poll_interval, start_time, end_time, limit))
+        results = [dict(row) for row in cursor.fetchall()]
 
-        results = []
-        for row in cursor.fetchall():
-            # Calculate online time: sample_count * poll_interval
-            online_seconds = row['sample_count'] * self.poll_interval
-            online_minutes = online_seconds / 60
-            online_hours = online_minutes / 60
-
-            results.append({
-                'client_uid': row['client_uid'],
-                'nickname': row['nickname'],
-                'sample_count': row['sample_count'],
-                'online_seconds': online_seconds,
-                'online_minutes': round(online_minutes, 2),
-                'online_hours': round(online_hours, 2),
-                'first_seen': row['first_seen'],
-                'last_seen': row['last_seen']
-            })
-
-        conn.close()
         return results
 
     def get_user_stats(self, client_uid: str, days: Optional[int] = 30) -> Optional[Dict]:
@@ -139,7 +164,6 @@ class StatsCalculator:
         row = cursor.fetchone()
 
         if not row:
-            conn.close()
             return None
 
         # Calculate online time
@@ -184,8 +208,6 @@ class StatsCalculator:
         cursor.execute(dow_query, (client_uid, start_time, end_time))
         activity_by_dow = {r['day_of_week']: r['sample_count'] for r in cursor.fetchall()}
 
-        conn.close()
-
         return {
             'client_uid': row['client_uid'],
             'nickname': row['nickname'],
@@ -235,7 +257,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
         return results
 
     def get_daily_activity(self, days: Optional[int] = 30) -> List[Dict]:
@@ -277,7 +298,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
         return results
 
     def get_top_idle_users(self, days: Optional[int] = 7, limit: int = 10) -> List[Dict]:
@@ -323,7 +343,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
         return results
 
     def get_peak_times(self, days: Optional[int] = 7, limit: int = 10) -> List[Dict]:
@@ -362,15 +381,15 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
         return results
 
-    def get_channel_stats(self, days: Optional[int] = 7) -> List[Dict]:
+    def get_channel_stats(self, days: Optional[int] = 7, limit: Optional[int] = None) -> List[Dict]:
         """
         Get channel popularity statistics.
 
         Args:
             days: Number of days to analyze
+            limit: Maximum number of channels to return (None = all)
 
         Returns:
             list: Channels sorted by total visits
@@ -390,11 +409,13 @@ class StatsCalculator:
         WHERE s.timestamp BETWEEN ? AND ?
         GROUP BY cs.channel_id
         ORDER BY total_visits DESC
+        LIMIT ?
         """
 
         conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute(query, (start_time, end_time))
+        # SQLite treats a negative LIMIT as no limit
+        cursor.execute(query, (start_time, end_time, -1 if limit is None else limit))
 
         results = [
             {
@@ -407,7 +428,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
         return results
 
     def get_growth_metrics(self, days: int = 7) -> Dict:
@@ -451,8 +471,6 @@ class StatsCalculator:
 
         returning_users = total_users - new_users
 
-        conn.close()
-
         return {
             'period_days': days,
             'total_unique_users': total_users,
@@ -517,7 +535,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
         return results
 
     def get_summary(self, days: Optional[int] = 7) -> Dict:
@@ -562,8 +579,6 @@ class StatsCalculator:
         """, (start_time, end_time))
         unique_users = cursor.fetchone()['unique_users']
 
-        conn.close()
-
         return {
             'period_days': days,
             'total_snapshots': total_snapshots,
@@ -631,8 +646,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
-
         return {
             'period_days': days,
             'total_samples': total_samples,
@@ -702,8 +715,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
-
         return {
             'period_days': days,
             'total_samples': total,
@@ -759,8 +770,6 @@ class StatsCalculator:
                         group_stats[gid]['unique_members'] += row['unique_members']
                         group_stats[gid]['total_samples'] += row['total_samples']
 
-        conn.close()
-
         results = [
             {
                 'group_id': gid,
@@ -832,7 +841,6 @@ class StatsCalculator:
             for row in cursor.fetchall()
         ]
 
-        conn.close()
         return results
 
     def get_connection_patterns(self, days: Optional[int] = 7, limit: int = 10) -> Dict:
@@ -927,8 +935,6 @@ class StatsCalculator:
             2
         )
 
-        conn.close()
-
         return {
             'period_days': days,
             'total_users': row['total_users'],
@@ -1067,7 +1073,6 @@ class StatsCalculator:
                 'last_seen': row['last_seen']
             })
 
-        conn.close()
         return results
 
     def get_ltv_summary(self, days: Optional[int] = None) -> Dict: